@@ -7,15 +7,158 @@ This agent is responsible for:
 3. Creating a knowledge graph of the code
 """
 
+import asyncio
+import functools
+import heapq
+import itertools
 import os
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Final, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
 from langchain.schema import HumanMessage
 from llama_index.core import VectorStoreIndex
-from llama_index.core import Response
+from llama_index.core import ChatPromptTemplate, get_response_synthesizer
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.base.response.schema import PydanticResponse
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.response_synthesizers import BaseSynthesizer, ResponseMode
+from llama_index.core.schema import NodeWithScore
+from pydantic import BaseModel, Field
 
+from agents.repo_agent import RepoManager
 from utils.config import AgentConfig
+from utils import fast_json
+from utils.file_reader import MappedFile, map_files
+from utils.llm_cache import SemanticLLMCache, fingerprint_repository
+
+
+# Query used to retrieve the code context shared by all analyses
+CONTEXT_QUERY: Final[str] = (
+    "Overall architecture, key components, dependencies and code quality of this codebase"
+)
+
+# Template shared by all analyses. The fixed instructions go in the system
+# message and the retrieved code context comes first in the user message, so
+# every analysis prompt starts with the same prefix and the provider's prompt
+# cache can reuse it; only the task at the end differs.
+ANALYSIS_TEMPLATE: Final[ChatPromptTemplate] = ChatPromptTemplate(message_templates=[
+    ChatMessage(
+        role=MessageRole.SYSTEM,
+        content=(
+            "You are an expert software engineer analyzing a code repository. "
+            "Base your answers only on the code context provided, and say so "
+            "when the context doesn't cover part of a task instead of guessing."
+        )
+    ),
+    ChatMessage(
+        role=MessageRole.USER,
+        content=(
+            "Code context from the repository is below.\n"
+            "---------------------\n"
+            "{context_str}\n"
+            "---------------------\n"
+            "Using the code context, complete the following task.\n"
+            "Task: {query_str}\n"
+            "Answer: "
+        )
+    ),
+])
+
+# Analysis prompts sent to the code index
+ARCHITECTURE_PROMPT: Final[str] = """
+Analyze the overall architecture of this codebase.
+Consider:
+1. What architectural patterns are used?
+2. How is the code organized?
+3. What are the main modules and their responsibilities?
+4. How do the components interact with each other?
+
+Format your response as a JSON with the following keys:
+- patterns: List of architectural patterns identified
+- structure: Description of the code organization
+- modules: Dictionary of main modules and their responsibilities
+- interactions: Description of how components interact
+"""
+
+COMPONENTS_PROMPT: Final[str] = """
+Identify the key components in this codebase.
+For each component, provide:
+1. Name
+2. Purpose
+3. Location (file path)
+4. Dependencies on other components
+5. Key functionality
+
+Focus on the most important components that are essential to understanding the codebase.
+Format your response as a JSON list of component objects.
+"""
+
+DEPENDENCIES_PROMPT: Final[str] = """
+Extract the dependencies of this codebase.
+Consider:
+1. External libraries and frameworks used
+2. Third-party services integrated
+3. Key internal dependencies between components
+
+Format your response as a JSON with the following keys:
+- external: List of external dependencies with versions if available
+- services: List of third-party services used
+- internal: Dictionary of internal component dependencies
+"""
+
+CODE_QUALITY_PROMPT: Final[str] = """
+Analyze the code quality of this codebase.
+Consider:
+1. Code organization and cleanliness
+2. Documentation quality
+3. Test coverage
+4. Maintainability
+5. Potential issues or technical debt
+
+Format your response as a JSON with the following keys:
+- overall_score: Numerical score from 1-10
+- strengths: List of strengths in the codebase
+- weaknesses: List of weaknesses or areas for improvement
+- recommendations: List of recommendations to improve code quality
+"""
+
+
+class ArchitectureAnalysis(BaseModel):
+    """Structured architecture analysis."""
+    patterns: List[str] = Field(description="Architectural patterns identified")
+    structure: str = Field(description="Description of the code organization")
+    modules: Dict[str, str] = Field(description="Main modules and their responsibilities")
+    interactions: str = Field(description="How components interact")
+
+
+class Component(BaseModel):
+    """A key component of the codebase."""
+    name: str
+    purpose: str
+    location: str = Field(description="File path of the component")
+    dependencies: List[str] = Field(description="Other components this one depends on")
+    key_functionality: str
+
+
+class ComponentList(BaseModel):
+    """Key components of the codebase."""
+    components: List[Component]
+
+
+class DependencyAnalysis(BaseModel):
+    """Structured dependency analysis."""
+    external: List[str] = Field(description="External dependencies with versions if available")
+    services: List[str] = Field(description="Third-party services used")
+    internal: Dict[str, List[str]] = Field(description="Internal dependencies of each component")
+
+
+class CodeQualityAnalysis(BaseModel):
+    """Structured code quality analysis."""
+    overall_score: float = Field(ge=1, le=10, description="Score from 1 to 10")
+    strengths: List[str]
+    weaknesses: List[str]
+    recommendations: List[str]
 
 
 class CodeUnderstandingAgent:
@@ -28,10 +171,51 @@ class CodeUnderstandingAgent:
             config: Configuration for the agent
         """
         self.config = config
+        self.repo_fingerprint = None
+        self._context = None
+        self._synthesizers: Dict[Type[BaseModel], BaseSynthesizer] = {}
+        
+        # Queries specialized for each analysis
+        self._query_architecture = functools.partial(
+            self._query_llm, query=ARCHITECTURE_PROMPT, output_cls=ArchitectureAnalysis
+        )
+        self._query_components = functools.partial(
+            self._query_llm, query=COMPONENTS_PROMPT, output_cls=ComponentList
+        )
+        self._query_dependencies = functools.partial(
+            self._query_llm, query=DEPENDENCIES_PROMPT, output_cls=DependencyAnalysis
+        )
+        self._query_code_quality = functools.partial(
+            self._query_llm, query=CODE_QUALITY_PROMPT, output_cls=CodeQualityAnalysis
+        )
+        
+        agent_config = config.agent_configs["code_understanding"]
+        self.cache = None
+        if agent_config.get("cache_responses", True):
+            cache_dir = Path(config.cache_dir or Path(config.output_dir) / ".cache")
+            self.cache = SemanticLLMCache(
+                cache_dir / "llm_responses.sqlite",
+                ttl=agent_config.get("cache_ttl"),
+                scope=config.cache_scope
+            )
         
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the code understanding agent.
         
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Updated state
+        """
+        return asyncio.run(self.arun(state))
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the code understanding agent asynchronously.
+        
+        File loading runs on a worker thread so it doesn't block the event
+        loop other graph branches share.
+        
         Args:
             state: Current state of the workflow
             
@@ -44,23 +228,17 @@ class CodeUnderstandingAgent:
                 return state
             
             # Get file content for priority files first
-            self.load_priority_files(state)
-            
-            # Analyze the codebase structure
-            architecture = self.analyze_architecture(state)
-            state["understanding"]["architecture"] = architecture
-            
-            # Identify key components
-            components = self.identify_components(state)
-            state["understanding"]["components"] = components
-            
-            # Extract dependencies
-            dependencies = self.extract_dependencies(state)
-            state["understanding"]["dependencies"] = dependencies
+            await asyncio.to_thread(self.load_priority_files, state)
+            self.repo_fingerprint = await asyncio.to_thread(
+                fingerprint_repository,
+                state["repo_url"],
+                state["repo_path"],
+                state["file_list"],
+                state.get("commit_sha")
+            )
             
-            # Analyze code quality
-            code_quality = self.analyze_code_quality(state)
-            state["understanding"]["code_quality"] = code_quality
+            # Run the analyses concurrently
+            state["understanding"].update(await self._arun(state))
             
             # Update status
             state["status"] = "understanding_complete"
@@ -71,6 +249,30 @@ class CodeUnderstandingAgent:
             
         return state
     
+    async def _arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the four analyses concurrently.
+        
+        The analyses are independent LLM round-trips, so they are awaited
+        together instead of paying for each one in turn.
+        
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Analyses keyed by their name in state["understanding"]
+        """
+        # Retrieve fresh context for this run
+        self._context = None
+        
+        analyses = {
+            "architecture": self.analyze_architecture,
+            "components": self.identify_components,
+            "dependencies": self.extract_dependencies,
+            "code_quality": self.analyze_code_quality,
+        }
+        results = await asyncio.gather(*(analyze(state) for analyze in analyses.values()))
+        return dict(zip(analyses, results))
+    
     def load_priority_files(self, state: Dict[str, Any]) -> None:
         """Load content of priority files into the state.
         
@@ -78,35 +280,161 @@ class CodeUnderstandingAgent:
             state: Current state of the workflow
         """
         priority_files = self.config.agent_configs["code_understanding"]["priority_files"]
-        repo_path = Path(state["repo_path"])
+        repo_path = state["repo_path"]
         files_content = state.get("files_content", {})
         
-        # Find priority files in the repository
-        for file_pattern in priority_files:
-            for file_path in state["file_list"]:
-                if file_path.endswith(file_pattern) or os.path.basename(file_path) == file_pattern:
-                    try:
-                        with open(repo_path / file_path, 'r', encoding='utf-8') as f:
-                            files_content[file_path] = f.read()
-                    except Exception as e:
-                        # Skip files that can't be read
-                        continue
-        
-        # Load some additional files if needed
+        # Find priority files in the repository. Plain file names are matched
+        # against a basename index; patterns containing a directory are
+        # matched as path suffixes in a single pass.
+        paths_by_name = defaultdict(list)
+        for file_path in state["file_list"]:
+            paths_by_name[os.path.basename(file_path)].append(file_path)
+        
+        # Files already known to be unreadable are skipped in both passes
+        failed_paths = state.setdefault("unreadable_files", set())
+        
+        priority_paths = [
+            file_path
+            for file_pattern in priority_files if "/" not in file_pattern
+            for file_path in paths_by_name.get(file_pattern, ())
+            if file_path not in failed_paths
+        ]
+        
+        path_patterns = frozenset(p for p in priority_files if "/" in p)
+        if path_patterns:
+            path_suffixes = tuple("/" + p for p in path_patterns)
+            priority_paths.extend(
+                file_path for file_path in state["file_list"]
+                if (file_path in path_patterns or file_path.endswith(path_suffixes))
+                and file_path not in failed_paths
+            )
+        
+        self._read_files(repo_path, dict.fromkeys(priority_paths), files_content, failed_paths)
+        
+        # Load some additional files if needed, smallest first, until either
+        # the file count or the byte budget is used up. Batches are sized to
+        # the remaining count so unreadable files are replaced by the next ones.
         max_files = self.config.agent_configs["code_understanding"]["max_files_to_analyze"]
-        if len(files_content) < max_files:
-            for file_path in state["file_list"]:
-                if file_path not in files_content and len(files_content) < max_files:
-                    try:
-                        with open(repo_path / file_path, 'r', encoding='utf-8') as f:
-                            files_content[file_path] = f.read()
-                    except Exception as e:
-                        # Skip files that can't be read
-                        continue
+        max_total_bytes = self.config.agent_configs["code_understanding"]["max_total_bytes"]
+        remaining = max_files - len(files_content)
+        remaining_bytes = max_total_bytes - sum(len(content) for content in files_content.values())
+        candidates = self._smallest_first(
+            repo_path,
+            (p for p in state["file_list"] if p not in files_content and p not in failed_paths),
+            failed_paths
+        )
+        while remaining > 0:
+            batch = []
+            for size, file_path in itertools.islice(candidates, remaining):
+                # Candidates are ordered by size, so none of the later ones fit either
+                if size > remaining_bytes:
+                    break
+                batch.append(file_path)
+                remaining_bytes -= size
+            if not batch:
+                break
+            self._read_files(repo_path, batch, files_content, failed_paths)
+            remaining = max_files - len(files_content)
+            remaining_bytes = max_total_bytes - sum(len(content) for content in files_content.values())
         
         state["files_content"] = files_content
+        
+        self._index_missing_files(state["code_index"], files_content)
+    
+    def _index_missing_files(self, index: VectorStoreIndex, files_content: Dict[str, MappedFile]) -> None:
+        """Add loaded files that the index doesn't contain yet.
+        
+        All missing files are split and inserted in one call, so their chunks
+        are embedded in batches of the embedding model's batch size rather
+        than one request per file.
+        
+        Args:
+            index: Index of the codebase
+            files_content: Mapping of relative paths to mapped files
+        """
+        indexed = index.ref_doc_info
+        documents = [
+            RepoManager.make_document(file_path, content.read())
+            for file_path, content in files_content.items()
+            if file_path not in indexed
+        ]
+        if not documents:
+            return
+        
+        splitter = SentenceSplitter(
+            chunk_size=self.config.chunk_size,
+            chunk_overlap=self.config.chunk_overlap
+        )
+        index.insert_nodes(splitter.get_nodes_from_documents(documents))
+        for document in documents:
+            index.docstore.set_document_hash(document.id_, document.hash)
+    
+    def _smallest_first(
+        self,
+        repo_path: str,
+        file_paths: Iterable[str],
+        failed_paths: Set[str]
+    ) -> Iterator[Tuple[int, str]]:
+        """Yield files in ascending size order.
+        
+        Files are ordered lazily through a heap, so only the files actually
+        consumed are popped. Files that can't be stat'ed or exceed
+        max_file_bytes are recorded in failed_paths instead.
+        
+        Args:
+            repo_path: Path to the repository
+            file_paths: Paths of the candidate files, relative to the repository
+            failed_paths: Set of relative paths that couldn't be read
+            
+        Returns:
+            Iterator of (size, relative path) pairs
+        """
+        prefix = os.path.join(repo_path, "")
+        sized_paths = []
+        for file_path in file_paths:
+            try:
+                size = os.stat(prefix + file_path).st_size
+            except OSError:
+                failed_paths.add(file_path)
+                continue
+            if size > self.config.max_file_bytes:
+                failed_paths.add(file_path)
+            else:
+                sized_paths.append((size, file_path))
+        
+        heapq.heapify(sized_paths)
+        while sized_paths:
+            yield heapq.heappop(sized_paths)
     
-    def analyze_architecture(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def _read_files(
+        self,
+        repo_path: str,
+        file_paths: Iterable[str],
+        files_content: Dict[str, MappedFile],
+        failed_paths: Set[str]
+    ) -> None:
+        """Map files concurrently and add them to files_content.
+        
+        File content is memory-mapped and only decoded when a consumer calls
+        read(), so the state holds references rather than full text.
+        Files that can't be opened, exceed max_file_bytes or look binary are
+        skipped and recorded in failed_paths.
+        
+        Args:
+            repo_path: Path to the repository
+            file_paths: Paths of the files to read, relative to the repository
+            files_content: Mapping of relative paths to mapped files to update
+            failed_paths: Set of relative paths that couldn't be read
+        """
+        prefix = os.path.join(repo_path, "")
+        abs_paths = {prefix + file_path: file_path for file_path in file_paths}
+        for abs_path, content in map_files(abs_paths, max_bytes=self.config.max_file_bytes):
+            if content is None:
+                failed_paths.add(abs_paths[abs_path])
+            else:
+                files_content[abs_paths[abs_path]] = content
+    
+    async def analyze_architecture(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze the codebase architecture.
         
         Args:
@@ -116,40 +444,15 @@ class CodeUnderstandingAgent:
             Architecture analysis
         """
         # Use the LLM to analyze the codebase architecture
-        query = """
-        Analyze the overall architecture of this codebase. 
-        Consider:
-        1. What architectural patterns are used?
-        2. How is the code organized?
-        3. What are the main modules and their responsibilities?
-        4. How do the components interact with each other?
-        
-        Format your response as a JSON with the following keys:
-        - patterns: List of architectural patterns identified
-        - structure: Description of the code organization
-        - modules: Dictionary of main modules and their responsibilities
-        - interactions: Description of how components interact
-        """
-        
-        response = self._query_llm(state, query)
-        
-        # Parse response
-        try:
-            # For simplicity, we'll use the response as-is
-            # In a real implementation, you'd parse the JSON response
-            architecture = {
-                "analysis": response.response,
-                "confidence": response.metadata.get("confidence", 0.8)
-            }
-        except Exception as e:
-            architecture = {
-                "analysis": "Failed to parse architecture analysis",
-                "error": str(e)
-            }
+        response = await self._query_architecture(state)
         
-        return architecture
+        return {
+            "analysis": response.response.model_dump_json(indent=2),
+            **response.response.model_dump(),
+            "confidence": response.metadata.get("confidence", 0.8)
+        }
     
-    def identify_components(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def identify_components(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Identify key components in the codebase.
         
         Args:
@@ -158,30 +461,17 @@ class CodeUnderstandingAgent:
         Returns:
             Key components
         """
-        query = """
-        Identify the key components in this codebase.
-        For each component, provide:
-        1. Name
-        2. Purpose
-        3. Location (file path)
-        4. Dependencies on other components
-        5. Key functionality
-        
-        Focus on the most important components that are essential to understanding the codebase.
-        Format your response as a JSON list of component objects.
-        """
-        
-        response = self._query_llm(state, query)
+        response = await self._query_components(state)
+        components = response.response.model_dump()["components"]
         
-        # Parse response
-        components = {
-            "list": response.response,
-            "count": response.metadata.get("component_count", 0)
+        # "list" holds the components as a JSON list of component objects
+        return {
+            "list": fast_json.dumps(components, indent=True),
+            "components": components,
+            "count": len(components)
         }
-        
-        return components
     
-    def extract_dependencies(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def extract_dependencies(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Extract dependencies from the codebase.
         
         Args:
@@ -190,30 +480,14 @@ class CodeUnderstandingAgent:
         Returns:
             Dependencies
         """
-        query = """
-        Extract the dependencies of this codebase.
-        Consider:
-        1. External libraries and frameworks used
-        2. Third-party services integrated
-        3. Key internal dependencies between components
-        
-        Format your response as a JSON with the following keys:
-        - external: List of external dependencies with versions if available
-        - services: List of third-party services used
-        - internal: Dictionary of internal component dependencies
-        """
-        
-        response = self._query_llm(state, query)
+        response = await self._query_dependencies(state)
         
-        # Parse response
-        dependencies = {
-            "analysis": response.response,
-            "timestamp": response.metadata.get("timestamp")
+        return {
+            "analysis": response.response.model_dump_json(indent=2),
+            **response.response.model_dump()
         }
-        
-        return dependencies
     
-    def analyze_code_quality(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze_code_quality(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze the code quality.
         
         Args:
@@ -222,49 +496,97 @@ class CodeUnderstandingAgent:
         Returns:
             Code quality analysis
         """
-        query = """
-        Analyze the code quality of this codebase.
-        Consider:
-        1. Code organization and cleanliness
-        2. Documentation quality
-        3. Test coverage
-        4. Maintainability
-        5. Potential issues or technical debt
-        
-        Format your response as a JSON with the following keys:
-        - overall_score: Numerical score from 1-10
-        - strengths: List of strengths in the codebase
-        - weaknesses: List of weaknesses or areas for improvement
-        - recommendations: List of recommendations to improve code quality
-        """
-        
-        response = self._query_llm(state, query)
+        response = await self._query_code_quality(state)
         
-        # Parse response
-        code_quality = {
-            "analysis": response.response,
+        return {
+            "analysis": response.response.model_dump_json(indent=2),
+            **response.response.model_dump(),
             "confidence": response.metadata.get("confidence", 0.7)
         }
+    
+    async def _retrieve_context(self, index: VectorStoreIndex) -> List[NodeWithScore]:
+        """Retrieve the code context shared by all analyses.
         
-        return code_quality
+        The context is retrieved once per index, on first use, so concurrent
+        analyses share a single embedding and vector search.
+        
+        Args:
+            index: Index of the codebase
+            
+        Returns:
+            Retrieved nodes
+        """
+        if self._context is None or self._context[0] is not index:
+            top_k = self.config.agent_configs["code_understanding"].get("context_top_k", 20)
+            retriever = index.as_retriever(similarity_top_k=top_k)
+            self._context = (index, asyncio.ensure_future(retriever.aretrieve(CONTEXT_QUERY)))
+        return await self._context[1]
     
-    def _query_llm(self, state: Dict[str, Any], query: str) -> Response:
+    def _get_synthesizer(self, output_cls: Type[BaseModel]) -> BaseSynthesizer:
+        """Return the response synthesizer for an output schema, creating it once.
+        
+        Args:
+            output_cls: Pydantic model the synthesizer produces
+            
+        Returns:
+            Response synthesizer
+        """
+        synthesizer = self._synthesizers.get(output_cls)
+        if synthesizer is None:
+            synthesizer = get_response_synthesizer(
+                response_mode=ResponseMode.COMPACT,
+                output_cls=output_cls,
+                text_qa_template=ANALYSIS_TEMPLATE
+            )
+            self._synthesizers[output_cls] = synthesizer
+        return synthesizer
+    
+    async def _query_llm(
+        self,
+        state: Dict[str, Any],
+        query: str,
+        output_cls: Type[BaseModel]
+    ) -> PydanticResponse:
         """Query the LLM using the codebase index.
         
+        The query is answered against the shared code context rather than a
+        retrieval of its own, and the LLM is asked for structured output
+        matching output_cls. Responses are served from the cache when the
+        same query was already answered for this repository.
+        
         Args:
             state: Current state of the workflow
             query: Query to send to the LLM
+            output_cls: Pydantic model the response is parsed into
             
         Returns:
-            Response from the LLM
+            Response from the LLM holding an instance of output_cls
         """
         # Get the index from the state
         index = state["code_index"]
         
-        # Create query engine
-        query_engine = index.as_query_engine()
+        async def execute_query() -> Dict[str, Any]:
+            # Synthesize a structured answer from the shared context
+            synthesizer = self._get_synthesizer(output_cls)
+            context = await self._retrieve_context(index)
+            async with self.config.llm_limiter:
+                response = await synthesizer.asynthesize(query, context)
+            return {
+                "response": response.response.model_dump_json(),
+                "metadata": response.metadata or {}
+            }
         
-        # Execute query
-        response = query_engine.query(query)
+        if self.cache is None or self.repo_fingerprint is None:
+            payload = await execute_query()
+        else:
+            payload = await self.cache.aget_or_compute(
+                f"code_understanding.{output_cls.__name__}",
+                self.repo_fingerprint,
+                query,
+                execute_query
+            )
         
-        return response
+        return PydanticResponse(
+            response=output_cls.model_validate_json(payload["response"]),
+            metadata=payload["metadata"]
+        )
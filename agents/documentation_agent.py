@@ -7,15 +7,191 @@ This agent is responsible for:
 3. Documenting code structure and organization
 """
 
+import ast
 import os
-from pathlib import Path
-from typing import Dict, Any, List, Optional
+import re
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Union
 import json
 
 from langchain.schema import HumanMessage
 from llama_index.core import VectorStoreIndex
 
+from utils import fast_json
 from utils.config import AgentConfig
+from utils.file_reader import write_text_files
+
+
+# Leading module docstring, used for Python sources that don't parse
+DOCSTRING_PATTERN = re.compile(
+    r"\A\s*[rRuUbB]{0,2}(?P<quote>\"{3}|'{3})(?P<body>.*?)(?P=quote)",
+    re.DOTALL
+)
+
+# Definition lines, used for sources that can't be parsed as Python
+DEFINITION_PATTERN = re.compile(
+    r"^[ \t]*(?:(?:async[ \t]+)?(?P<kind>def|class)[ \t]+)(?P<name>\w+)[ \t]*(?P<args>\([^)\n]*\))?",
+    re.MULTILINE
+)
+
+# Export statements and function definitions in JavaScript/TypeScript sources
+JS_DECLARATION_PATTERN = re.compile(
+    r"^[ \t]*(?:(?P<export>export .*)|(?P<function>function .*|.*=> \{.*))$",
+    re.MULTILINE
+)
+
+
+# Entry point and configuration file names recognized in the documentation
+MAIN_FILE_NAMES = frozenset({"main.py", "index.js", "app.py", "server.js"})
+CONFIG_FILE_NAMES = frozenset({
+    "config.py", "settings.py", "config.json", ".env.example",
+    "config.js", "config.yml", "config.yaml"
+})
+
+
+# Fixed documentation blocks, joined once at import
+README_TABLE_OF_CONTENTS = "\n".join([
+    "## Table of Contents\n",
+    "- [Overview](#overview)",
+    "- [Installation](#installation)",
+    "- [Usage](#usage)",
+    "- [Architecture](#architecture)",
+    "- [API Documentation](#api-documentation)",
+    "- [Contributing](#contributing)",
+    "- [License](#license)\n"
+])
+
+README_FOOTER = "\n".join([
+    "## API Documentation\n",
+    "For detailed API documentation, please refer to the `docs/api` directory.\n",
+    "## Contributing\n",
+    "Contributions are welcome! Please feel free to submit a Pull Request.\n",
+    "## License\n",
+    "Please see the LICENSE file for details.\n"
+])
+
+API_USAGE_EXAMPLES = "\n".join([
+    "## Usage Examples\n",
+    "Below are examples of how to use key components of the API.\n",
+    "```python",
+    "# Python example",
+    "# ...",
+    "```\n"
+])
+
+JS_USAGE_EXAMPLE = "\n".join([
+    "```javascript",
+    "// JavaScript example",
+    "// ...",
+    "```\n"
+])
+
+USAGE_GUIDE_TABLE_OF_CONTENTS = "\n".join([
+    "## Table of Contents\n",
+    "- [Installation](#installation)",
+    "- [Configuration](#configuration)",
+    "- [Basic Usage](#basic-usage)",
+    "- [Advanced Features](#advanced-features)",
+    "- [Troubleshooting](#troubleshooting)\n"
+])
+
+USAGE_PATTERNS = "\n".join([
+    "\nHere are some common usage patterns:\n",
+    "1. **Basic operation**: [Description of basic operation]",
+    "2. **Common task**: [Description of common task]",
+    "3. **Typical workflow**: [Description of typical workflow]\n"
+])
+
+USAGE_GUIDE_FOOTER = "\n".join([
+    "## Advanced Features\n",
+    "This software includes several advanced features for power users:\n",
+    "1. **Feature 1**: [Description of advanced feature 1]",
+    "2. **Feature 2**: [Description of advanced feature 2]",
+    "3. **Feature 3**: [Description of advanced feature 3]\n",
+    "## Troubleshooting\n",
+    "### Common Issues\n",
+    "Here are solutions to common issues you might encounter:\n",
+    "1. **Problem**: [Description of common problem 1]",
+    "   **Solution**: [Solution to problem 1]\n",
+    "2. **Problem**: [Description of common problem 2]",
+    "   **Solution**: [Solution to problem 2]\n",
+    "### Getting Help\n",
+    "If you encounter issues not covered in this guide, please:",
+    "- Check the documentation",
+    "- Look for similar issues in the project's issue tracker",
+    "- Open a new issue if needed\n"
+])
+
+
+class RepoFacts(NamedTuple):
+    """Facts about the repository shared by the documentation generators."""
+    repo_name: str
+    description: str
+    python_files: List[str]
+    js_files: List[str]
+    main_file: Optional[str]
+    config_files: List[str]
+    has_requirements: bool
+    has_setup: bool
+    has_package_json: bool
+
+
+class ModuleApi(NamedTuple):
+    """Public API extracted from a source file."""
+    docstring: Optional[str]
+    functions: List[str]
+    classes: List[str]
+
+
+def extract_module_api(file_path: str, file_content: Union[str, bytes]) -> ModuleApi:
+    """Extract the docstring, functions and classes of a source file.
+    
+    Python files are parsed with ast, so multi-line and decorated
+    definitions come out right; other files, and Python files that don't
+    parse, are scanned for definition lines. Raw bytes are parsed without
+    decoding them to text first, honoring any source encoding declaration.
+    
+    Args:
+        file_path: Path of the file, used to recognize Python sources
+        file_content: Content of the file as text or raw bytes
+        
+    Returns:
+        API of the file
+    """
+    tree = None
+    if file_path.endswith(".py"):
+        try:
+            tree = ast.parse(file_content)
+        except (SyntaxError, ValueError):
+            pass
+    
+    functions = []
+    classes = []
+    if tree is None:
+        if isinstance(file_content, bytes):
+            file_content = file_content.decode("utf-8", "replace")
+        for match in DEFINITION_PATTERN.finditer(file_content):
+            if match["kind"] == "def":
+                functions.append(match["name"] + (match["args"] or "()"))
+            else:
+                classes.append(match["name"] + (match["args"] or ""))
+        
+        docstring = None
+        if file_path.endswith(".py"):
+            match = DOCSTRING_PATTERN.match(file_content)
+            docstring = match["body"].strip() if match else None
+        return ModuleApi(docstring, functions, classes)
+    
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append((node.lineno, f"{node.name}({ast.unparse(node.args)})"))
+        elif isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(base) for base in node.bases + node.keywords)
+            classes.append((node.lineno, f"{node.name}({bases})" if bases else node.name))
+    return ModuleApi(
+        ast.get_docstring(tree),
+        [signature for _, signature in sorted(functions)],
+        [signature for _, signature in sorted(classes)]
+    )
 
 
 class DocumentationAgent:
@@ -28,6 +204,10 @@ class DocumentationAgent:
             config: Configuration for the agent
         """
         self.config = config
+        self._module_apis: Dict[str, ModuleApi] = {}
+        self._facts: Optional[RepoFacts] = None
+        self._pending_writes: Optional[Dict[str, str]] = None
+        self._parsed_components: Optional[Tuple[Dict[str, Any], Optional[List[Any]]]] = None
         
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the documentation generation agent.
@@ -43,17 +223,23 @@ class DocumentationAgent:
                 state["errors"].append("Code understanding must be completed before generating documentation")
                 return state
             
-            # Initialize documentation dictionary
+            doc_config = self.config.agent_configs["documentation"]
+            
+            # Initialize documentation dictionary; files are written together
+            # once all documents are generated
             state["documentation"] = {}
+            self._pending_writes = {}
+            self._module_apis = {}
+            self._facts = self._collect_repo_facts(state)
             
             # Generate README if configured
-            if self.config.agent_configs["documentation"]["generate_readme"]:
+            if doc_config["generate_readme"]:
                 readme = self.generate_readme(state)
                 state["documentation"]["readme"] = readme
                 self.save_documentation(state, "README.md", readme)
             
             # Generate API documentation if configured
-            if self.config.agent_configs["documentation"]["generate_api_docs"]:
+            if doc_config["generate_api_docs"]:
                 api_docs = self.generate_api_docs(state)
                 state["documentation"]["api_docs"] = api_docs
                 
@@ -73,9 +259,92 @@ class DocumentationAgent:
         except Exception as e:
             state["errors"].append(f"Documentation generation error: {str(e)}")
             state["status"] = "error"
+        
+        finally:
+            self._flush_documentation(state)
             
         return state
     
+    def _flush_documentation(self, state: Dict[str, Any]) -> None:
+        """Write the documentation files queued by save_documentation.
+        
+        Args:
+            state: Current state of the workflow
+        """
+        pending_writes, self._pending_writes = self._pending_writes, None
+        if not pending_writes:
+            return
+        
+        try:
+            write_text_files(pending_writes)
+        except OSError as e:
+            state["errors"].append(f"Documentation write error: {str(e)}")
+            state["status"] = "error"
+    
+    def _repo_facts(self, state: Dict[str, Any]) -> RepoFacts:
+        """Return the repository facts for the current run, collecting them if needed.
+        
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Repository facts
+        """
+        if self._facts is None:
+            self._facts = self._collect_repo_facts(state)
+        return self._facts
+    
+    def _collect_repo_facts(self, state: Dict[str, Any]) -> RepoFacts:
+        """Classify the repository files in a single pass and derive the description.
+        
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Repository facts
+        """
+        python_files = []
+        js_files = []
+        main_file = None
+        config_files = []
+        has_requirements = has_setup = has_package_json = False
+        
+        for file_path in state["file_list"]:
+            base_name = os.path.basename(file_path)
+            if file_path.endswith(".py"):
+                python_files.append(file_path)
+                has_setup = has_setup or base_name.endswith("setup.py")
+            elif file_path.endswith((".js", ".ts")):
+                js_files.append(file_path)
+            elif base_name.endswith("requirements.txt"):
+                has_requirements = True
+            elif base_name.endswith("package.json"):
+                has_package_json = True
+            if main_file is None and base_name in MAIN_FILE_NAMES:
+                main_file = file_path
+            if base_name in CONFIG_FILE_NAMES:
+                config_files.append(file_path)
+        
+        # Try to extract project description from the answers
+        description = "A software project."
+        if "answers" in state and state["answers"]:
+            for question, answer in state["answers"].items():
+                if "purpose" in question.lower() or "what is" in question.lower():
+                    description = answer["text"].partition(".")[0] + "."  # First sentence
+                    break
+        
+        return RepoFacts(
+            repo_name=os.path.basename(state["repo_url"].rstrip("/").split("/")[-1]),
+            description=description,
+            python_files=python_files,
+            js_files=js_files,
+            main_file=main_file,
+            config_files=config_files,
+            has_requirements=has_requirements,
+            has_setup=has_setup,
+            has_package_json=has_package_json
+        )
+    
     def generate_readme(self, state: Dict[str, Any]) -> str:
         """Generate a README file for the codebase.
         
@@ -86,7 +355,8 @@ class DocumentationAgent:
             Markdown README content
         """
         # Extract repo name
-        repo_name = os.path.basename(state["repo_url"].rstrip("/").split("/")[-1])
+        facts = self._repo_facts(state)
+        repo_name = facts.repo_name
         
         # Build README content
         sections = []
@@ -94,25 +364,10 @@ class DocumentationAgent:
         # Title and introduction
         sections.append(f"# {repo_name}\n")
         
-        # Try to extract project description from understanding
-        description = "A software project."
-        if "answers" in state and state["answers"]:
-            for question, answer in state["answers"].items():
-                if "purpose" in question.lower() or "what is" in question.lower():
-                    description = answer["text"].split(".")[0] + "."  # First sentence
-                    break
-        
-        sections.append(f"{description}\n")
+        sections.append(f"{facts.description}\n")
         
         # Table of Contents
-        sections.append("## Table of Contents\n")
-        sections.append("- [Overview](#overview)")
-        sections.append("- [Installation](#installation)")
-        sections.append("- [Usage](#usage)")
-        sections.append("- [Architecture](#architecture)")
-        sections.append("- [API Documentation](#api-documentation)")
-        sections.append("- [Contributing](#contributing)")
-        sections.append("- [License](#license)\n")
+        sections.append(README_TABLE_OF_CONTENTS)
         
         # Overview
         sections.append("## Overview\n")
@@ -132,11 +387,11 @@ class DocumentationAgent:
         sections.append(f"cd {repo_name}")
         
         # Try to determine the installation method based on file types
-        if any(f.endswith("requirements.txt") for f in state["file_list"]):
+        if facts.has_requirements:
             sections.append("pip install -r requirements.txt")
-        elif any(f.endswith("setup.py") for f in state["file_list"]):
+        elif facts.has_setup:
             sections.append("pip install .")
-        elif any(f.endswith("package.json") for f in state["file_list"]):
+        elif facts.has_package_json:
             sections.append("npm install")
         
         sections.append("```\n")
@@ -146,9 +401,8 @@ class DocumentationAgent:
         sections.append("Basic usage instructions:\n")
         
         # Try to determine usage examples based on file types
-        main_files = [f for f in state["file_list"] if os.path.basename(f) in ["main.py", "index.js", "app.py", "server.js"]]
-        if main_files:
-            main_file = main_files[0]
+        main_file = facts.main_file
+        if main_file:
             if main_file.endswith(".py"):
                 sections.append("```python")
                 sections.append(f"python {main_file}")
@@ -164,31 +418,20 @@ class DocumentationAgent:
         sections.append("## Architecture\n")
         if "understanding" in state and "components" in state["understanding"]:
             sections.append("The codebase is organized into the following components:\n")
-            components_text = state["understanding"]["components"]["list"]
             # Extract component names if possible
-            try:
-                # This assumes components is a JSON string
-                components_data = json.loads(components_text)
+            components_data = self._parse_components(state)
+            if components_data is not None:
                 for component in components_data:
                     if isinstance(component, dict) and "name" in component:
                         sections.append(f"- **{component['name']}**: {component.get('purpose', '')}")
-            except (json.JSONDecodeError, TypeError):
+            else:
                 # Fallback to using the raw text
-                sections.append(components_text)
+                sections.append(state["understanding"]["components"]["list"])
         else:
             sections.append("The project architecture consists of multiple interconnected components.\n")
         
-        # API Documentation
-        sections.append("## API Documentation\n")
-        sections.append("For detailed API documentation, please refer to the `docs/api` directory.\n")
-        
-        # Contributing
-        sections.append("## Contributing\n")
-        sections.append("Contributions are welcome! Please feel free to submit a Pull Request.\n")
-        
-        # License
-        sections.append("## License\n")
-        sections.append("Please see the LICENSE file for details.\n")
+        # API Documentation, Contributing and License
+        sections.append(README_FOOTER)
         
         return "\n".join(sections)
     
@@ -205,18 +448,15 @@ class DocumentationAgent:
         
         # Try to extract components from the understanding
         if "understanding" in state and "components" in state["understanding"]:
-            components_text = state["understanding"]["components"]["list"]
+            components_data = self._parse_components(state)
             
-            try:
-                # This assumes components is a JSON string
-                components_data = json.loads(components_text)
-                
+            if components_data is not None:
                 for component in components_data:
                     if isinstance(component, dict) and "name" in component:
                         component_name = component["name"]
                         component_docs = self._generate_component_docs(state, component)
                         api_docs[component_name] = component_docs
-            except (json.JSONDecodeError, TypeError):
+            else:
                 # Fallback to generating a single API doc
                 api_docs["API Reference"] = self._generate_fallback_api_docs(state)
         else:
@@ -225,6 +465,35 @@ class DocumentationAgent:
         
         return api_docs
     
+    def _parse_components(self, state: Dict[str, Any]) -> Optional[List[Any]]:
+        """Return the components identified by code understanding, parsed once.
+        
+        The structured list is used when code understanding provides one;
+        otherwise the JSON text is parsed. The result is kept until the
+        components in the understanding change.
+        
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            List of components, or None if the component list isn't a JSON list
+        """
+        components = state["understanding"]["components"]
+        if self._parsed_components is not None and self._parsed_components[0] is components:
+            return self._parsed_components[1]
+        
+        components_data = components.get("components")
+        if components_data is None:
+            try:
+                components_data = fast_json.loads(components["list"])
+            except (json.JSONDecodeError, TypeError):
+                components_data = None
+        if not isinstance(components_data, list):
+            components_data = None
+        
+        self._parsed_components = (components, components_data)
+        return components_data
+    
     def _generate_component_docs(self, state: Dict[str, Any], component: Dict[str, Any]) -> str:
         """Generate documentation for a specific component.
         
@@ -271,45 +540,22 @@ class DocumentationAgent:
         # Try to generate API reference based on the component location
         if "location" in component and component["location"] in state["files_content"]:
             # Extract functions and classes from the file content
-            file_content = state["files_content"][component["location"]]
-            
-            # This is a very simplified approach - in a real implementation,
-            # you would use a proper code parser to extract API details
+            api = self._extract_module_api(state, component["location"])
             
-            # Look for function definitions
             sections.append("### Functions\n")
-            functions_found = False
-            
-            for line in file_content.split("\n"):
-                if line.strip().startswith("def "):
-                    functions_found = True
-                    # Extract function name and args
-                    func_def = line.strip()[4:].split("(", 1)
-                    func_name = func_def[0].strip()
-                    func_args = "(" + func_def[1].strip() if len(func_def) > 1 else "()"
-                    
-                    sections.append(f"#### `{func_name}{func_args}`\n")
-                    sections.append("Description: *Function description*\n")
+            for function in api.functions:
+                sections.append(f"#### `{function}`\n")
+                sections.append("Description: *Function description*\n")
             
-            if not functions_found:
+            if not api.functions:
                 sections.append("No functions found in this component.\n")
             
-            # Look for class definitions
             sections.append("### Classes\n")
-            classes_found = False
+            for cls in api.classes:
+                sections.append(f"#### `{cls}`\n")
+                sections.append("Description: *Class description*\n")
             
-            for line in file_content.split("\n"):
-                if line.strip().startswith("class "):
-                    classes_found = True
-                    # Extract class name
-                    class_def = line.strip()[6:].split("(", 1)
-                    class_name = class_def[0].strip()
-                    class_parent = "(" + class_def[1].strip() if len(class_def) > 1 else ""
-                    
-                    sections.append(f"#### `{class_name}{class_parent}`\n")
-                    sections.append("Description: *Class description*\n")
-            
-            if not classes_found:
+            if not api.classes:
                 sections.append("No classes found in this component.\n")
         else:
             sections.append("Detailed API reference information is not available for this component.\n")
@@ -332,7 +578,8 @@ class DocumentationAgent:
         Returns:
             Markdown API documentation
         """
-        repo_name = os.path.basename(state["repo_url"].rstrip("/").split("/")[-1])
+        facts = self._repo_facts(state)
+        repo_name = facts.repo_name
         
         sections = []
         
@@ -341,49 +588,35 @@ class DocumentationAgent:
         sections.append("This document provides an overview of the API for this codebase.\n")
         
         # Find key files
-        python_files = [f for f in state["file_list"] if f.endswith(".py")]
-        js_files = [f for f in state["file_list"] if f.endswith(".js") or f.endswith(".ts")]
+        python_files = facts.python_files
+        js_files = facts.js_files
         
         # Document Python files
         if python_files:
             sections.append("## Python Modules\n")
             
-            for file_path in sorted(python_files)[:10]:  # Limit to 10 files for brevity
+            documented_files = sorted(python_files)[:10]  # Limit to 10 files for brevity
+            
+            for file_path in documented_files:
                 file_name = os.path.basename(file_path)
                 sections.append(f"### {file_name}\n")
                 
                 if file_path in state["files_content"]:
-                    file_content = state["files_content"][file_path]
+                    api = self._extract_module_api(state, file_path)
                     
-                    # Extract docstring if available
-                    if '"""' in file_content or "'''" in file_content:
-                        docstring_start = file_content.find('"""') if '"""' in file_content else file_content.find("'''")
-                        if docstring_start >= 0:
-                            docstring_end = file_content.find('"""', docstring_start + 3) if '"""' in file_content else file_content.find("'''", docstring_start + 3)
-                            if docstring_end >= 0:
-                                docstring = file_content[docstring_start + 3:docstring_end].strip()
-                                sections.append(f"{docstring}\n")
+                    if api.docstring:
+                        sections.append(f"{api.docstring}\n")
                     
-                    # Look for functions and classes
-                    functions = []
-                    classes = []
-                    
-                    for line in file_content.split("\n"):
-                        if line.strip().startswith("def "):
-                            functions.append(line.strip())
-                        elif line.strip().startswith("class "):
-                            classes.append(line.strip())
-                    
-                    if functions:
+                    if api.functions:
                         sections.append("**Functions:**\n")
-                        for func in functions:
-                            sections.append(f"- `{func}`")
+                        for func in api.functions:
+                            sections.append(f"- `def {func}`")
                         sections.append("")
                     
-                    if classes:
+                    if api.classes:
                         sections.append("**Classes:**\n")
-                        for cls in classes:
-                            sections.append(f"- `{cls}`")
+                        for cls in api.classes:
+                            sections.append(f"- `class {cls}`")
                         sections.append("")
         
         # Document JavaScript/TypeScript files
@@ -395,18 +628,17 @@ class DocumentationAgent:
                 sections.append(f"### {file_name}\n")
                 
                 if file_path in state["files_content"]:
-                    file_content = state["files_content"][file_path]
+                    file_content = state["files_content"][file_path].read()
                     
-                    # Extract exports and functions
+                    # Extract exports and functions in a single pass
                     exports = []
                     functions = []
                     
-                    for line in file_content.split("\n"):
-                        line = line.strip()
-                        if line.startswith("export "):
-                            exports.append(line)
-                        elif line.startswith("function ") or "=> {" in line:
-                            functions.append(line)
+                    for match in JS_DECLARATION_PATTERN.finditer(file_content):
+                        if match["export"] is not None:
+                            exports.append(match["export"].strip())
+                        else:
+                            functions.append(match["function"].strip())
                     
                     if exports:
                         sections.append("**Exports:**\n")
@@ -421,21 +653,29 @@ class DocumentationAgent:
                         sections.append("")
         
         # Add usage examples section
-        sections.append("## Usage Examples\n")
-        sections.append("Below are examples of how to use key components of the API.\n")
-        sections.append("```python")
-        sections.append("# Python example")
-        sections.append("# ...")
-        sections.append("```\n")
+        sections.append(API_USAGE_EXAMPLES)
         
         if js_files:
-            sections.append("```javascript")
-            sections.append("// JavaScript example")
-            sections.append("// ...")
-            sections.append("```\n")
+            sections.append(JS_USAGE_EXAMPLE)
         
         return "\n".join(sections)
     
+    def _extract_module_api(self, state: Dict[str, Any], file_path: str) -> ModuleApi:
+        """Return the API of a loaded file, extracting it once per run.
+        
+        Args:
+            state: Current state of the workflow
+            file_path: Path of the file relative to the repository
+            
+        Returns:
+            API of the file
+        """
+        api = self._module_apis.get(file_path)
+        if api is None:
+            api = extract_module_api(file_path, state["files_content"][file_path].read_bytes())
+            self._module_apis[file_path] = api
+        return api
+    
     def generate_usage_guide(self, state: Dict[str, Any]) -> str:
         """Generate a usage guide for the codebase.
         
@@ -445,7 +685,8 @@ class DocumentationAgent:
         Returns:
             Markdown usage guide
         """
-        repo_name = os.path.basename(state["repo_url"].rstrip("/").split("/")[-1])
+        facts = self._repo_facts(state)
+        repo_name = facts.repo_name
         
         sections = []
         
@@ -454,12 +695,7 @@ class DocumentationAgent:
         sections.append("This guide provides instructions on how to use this software effectively.\n")
         
         # Table of Contents
-        sections.append("## Table of Contents\n")
-        sections.append("- [Installation](#installation)")
-        sections.append("- [Configuration](#configuration)")
-        sections.append("- [Basic Usage](#basic-usage)")
-        sections.append("- [Advanced Features](#advanced-features)")
-        sections.append("- [Troubleshooting](#troubleshooting)\n")
+        sections.append(USAGE_GUIDE_TABLE_OF_CONTENTS)
         
         # Installation
         sections.append("## Installation\n")
@@ -467,10 +703,10 @@ class DocumentationAgent:
         sections.append("Before installing this software, ensure you have the following prerequisites:\n")
         
         # Try to determine prerequisites based on file types
-        if any(f.endswith("requirements.txt") for f in state["file_list"]):
+        if facts.has_requirements:
             sections.append("- Python 3.7 or higher")
             sections.append("- pip (Python package manager)")
-        elif any(f.endswith("package.json") for f in state["file_list"]):
+        elif facts.has_package_json:
             sections.append("- Node.js 14 or higher")
             sections.append("- npm or yarn")
         
@@ -480,11 +716,11 @@ class DocumentationAgent:
         sections.append(f"cd {repo_name}")
         
         # Try to determine the installation method based on file types
-        if any(f.endswith("requirements.txt") for f in state["file_list"]):
+        if facts.has_requirements:
             sections.append("pip install -r requirements.txt")
-        elif any(f.endswith("setup.py") for f in state["file_list"]):
+        elif facts.has_setup:
             sections.append("pip install .")
-        elif any(f.endswith("package.json") for f in state["file_list"]):
+        elif facts.has_package_json:
             sections.append("npm install")
         
         sections.append("```\n")
@@ -493,13 +729,7 @@ class DocumentationAgent:
         sections.append("## Configuration\n")
         
         # Look for configuration files
-        config_files = [
-            f for f in state["file_list"] 
-            if os.path.basename(f) in [
-                "config.py", "settings.py", "config.json", ".env.example",
-                "config.js", "config.yml", "config.yaml"
-            ]
-        ]
+        config_files = facts.config_files
         
         if config_files:
             sections.append("The software can be configured using the following configuration files:\n")
@@ -511,14 +741,15 @@ class DocumentationAgent:
             # Try to show a sample from one of the config files
             for config_file in config_files:
                 if config_file in state["files_content"]:
-                    file_content = state["files_content"][config_file]
+                    file_content = state["files_content"][config_file].read()
                     ext = os.path.splitext(config_file)[1]
                     
                     sections.append(f"```{ext[1:] if ext else ''}")
-                    # Show first 10 lines or less
-                    content_lines = file_content.split("\n")[:10]
-                    sections.append("\n".join(content_lines))
-                    if len(file_content.split("\n")) > 10:
+                    # Show first 10 lines or less; splitting stops after
+                    # them, leaving the rest of the file in one piece
+                    content_lines = file_content.split("\n", 10)
+                    sections.append("\n".join(content_lines[:10]))
+                    if len(content_lines) > 10:
                         sections.append("# ... more configuration options ...")
                     sections.append("```")
                     break
@@ -529,9 +760,8 @@ class DocumentationAgent:
         sections.append("## Basic Usage\n")
         
         # Try to determine usage examples based on file types
-        main_files = [f for f in state["file_list"] if os.path.basename(f) in ["main.py", "index.js", "app.py", "server.js"]]
-        if main_files:
-            main_file = main_files[0]
+        main_file = facts.main_file
+        if main_file:
             if main_file.endswith(".py"):
                 sections.append("```python")
                 sections.append(f"python {main_file}")
@@ -541,51 +771,29 @@ class DocumentationAgent:
                 sections.append(f"node {main_file}")
                 sections.append("```")
             
-            sections.append("\nHere are some common usage patterns:\n")
-            sections.append("1. **Basic operation**: [Description of basic operation]")
-            sections.append("2. **Common task**: [Description of common task]")
-            sections.append("3. **Typical workflow**: [Description of typical workflow]\n")
+            sections.append(USAGE_PATTERNS)
         else:
             sections.append("Basic usage information will vary depending on your specific needs.\n")
         
-        # Advanced Features
-        sections.append("## Advanced Features\n")
-        sections.append("This software includes several advanced features for power users:\n")
-        sections.append("1. **Feature 1**: [Description of advanced feature 1]")
-        sections.append("2. **Feature 2**: [Description of advanced feature 2]")
-        sections.append("3. **Feature 3**: [Description of advanced feature 3]\n")
-        
-        # Troubleshooting
-        sections.append("## Troubleshooting\n")
-        sections.append("### Common Issues\n")
-        sections.append("Here are solutions to common issues you might encounter:\n")
-        sections.append("1. **Problem**: [Description of common problem 1]")
-        sections.append("   **Solution**: [Solution to problem 1]\n")
-        sections.append("2. **Problem**: [Description of common problem 2]")
-        sections.append("   **Solution**: [Solution to problem 2]\n")
-        
-        sections.append("### Getting Help\n")
-        sections.append("If you encounter issues not covered in this guide, please:")
-        sections.append("- Check the documentation")
-        sections.append("- Look for similar issues in the project's issue tracker")
-        sections.append("- Open a new issue if needed\n")
+        # Advanced Features, Troubleshooting and Getting Help
+        sections.append(USAGE_GUIDE_FOOTER)
         
         return "\n".join(sections)
     
     def save_documentation(self, state: Dict[str, Any], filename: str, content: str) -> None:
         """Save documentation to a file.
         
+        During a run the file is queued and written with the other
+        documentation files when the run finishes.
+        
         Args:
             state: Current state of the workflow
             filename: Name of the file to save
             content: Content to save
         """
-        output_dir = Path(state["output_dir"]) / "documentation"
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Handle subdirectories in the filename
-        file_path = output_dir / filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path = os.path.join(state["output_dir"], "documentation", filename)
         
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        if self._pending_writes is not None:
+            self._pending_writes[file_path] = content
+        else:
+            write_text_files({file_path: content})
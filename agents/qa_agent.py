@@ -7,15 +7,20 @@ This agent is responsible for:
 3. Explaining code functionality
 """
 
+import asyncio
 import os
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
 from langchain.schema import HumanMessage
 from llama_index.core import VectorStoreIndex
 from llama_index.core import Response
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.settings import Settings
 
 from utils.config import AgentConfig
+from utils.llm_cache import SemanticLLMCache, fingerprint_repository
 
 
 class QAAgent:
@@ -28,10 +33,39 @@ class QAAgent:
             config: Configuration for the agent
         """
         self.config = config
+        self.repo_fingerprint = None
+        self._query_engine: Optional[Tuple[VectorStoreIndex, RetrieverQueryEngine]] = None
+        
+        # Answers are cached per repository. With cache_across_repositories
+        # they are also shared between repositories, but only reused when the
+        # retrieved code chunks match, e.g. for forks or vendored code.
+        agent_config = config.agent_configs["qa"]
+        self.cache = None
+        self.cache_across_repositories = agent_config.get("cache_across_repositories", True)
+        if agent_config.get("cache_responses", True):
+            cache_dir = Path(config.cache_dir or Path(config.output_dir) / ".cache")
+            self.cache = SemanticLLMCache(
+                cache_dir / "llm_responses.sqlite",
+                similarity_threshold=agent_config.get("cache_similarity_threshold", 0.95),
+                ttl=agent_config.get("cache_ttl"),
+                signature_threshold=agent_config.get("cache_signature_threshold", 0.8),
+                scope=config.cache_scope
+            )
         
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the QA agent.
         
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Updated state
+        """
+        return asyncio.run(self.arun(state))
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the QA agent asynchronously.
+        
         Args:
             state: Current state of the workflow
             
@@ -47,13 +81,16 @@ class QAAgent:
             if not state.get("questions"):
                 state["questions"] = self.config.agent_configs["qa"]["default_questions"]
             
-            # Answer each question
-            answers = {}
-            for question in state["questions"]:
-                answer = self.answer_question(state, question)
-                answers[question] = answer
+            self.repo_fingerprint = await asyncio.to_thread(
+                fingerprint_repository,
+                state["repo_url"],
+                state["repo_path"],
+                state["file_list"],
+                state.get("commit_sha")
+            )
             
-            state["answers"] = answers
+            # Answer the questions concurrently
+            state["answers"] = await self._arun(state)
             
             # Update status
             state["status"] = "qa_complete"
@@ -64,6 +101,61 @@ class QAAgent:
             
         return state
     
+    async def _arun(self, state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Answer all questions concurrently.
+        
+        Each question is an independent LLM round-trip, so they are awaited
+        together, at most max_concurrency at a time, sharing one query engine.
+        Questions without an exact cached answer are embedded in one batch
+        up front, and the vectors are reused for the cache lookup and the
+        retrieval.
+        
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Answers keyed by question
+        """
+        questions = list(dict.fromkeys(state["questions"]))
+        query_engine = self._get_query_engine(state["code_index"])
+        semaphore = asyncio.Semaphore(self.config.agent_configs["qa"].get("max_concurrency", 8))
+        
+        def uncached_questions() -> List[str]:
+            return [
+                question for question in questions
+                if self.cache is None or self.repo_fingerprint is None
+                or self.cache.get("qa", self.repo_fingerprint, question) is None
+            ]
+        
+        # The cache lookups hit SQLite, so they run off the event loop
+        to_embed = await asyncio.to_thread(uncached_questions)
+        embeddings = {}
+        if to_embed:
+            vectors = await Settings.embed_model.aget_text_embedding_batch(to_embed)
+            embeddings = dict(zip(to_embed, vectors))
+        
+        async def answer(question: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aanswer_question(
+                    state, question, query_engine, embeddings.get(question)
+                )
+        
+        answers = await asyncio.gather(*(answer(question) for question in questions))
+        return dict(zip(questions, answers))
+    
+    def _get_query_engine(self, index: VectorStoreIndex) -> RetrieverQueryEngine:
+        """Return the query engine for an index, creating it once per index.
+        
+        Args:
+            index: Index of the codebase
+            
+        Returns:
+            Query engine shared by all questions against the index
+        """
+        if self._query_engine is None or self._query_engine[0] is not index:
+            self._query_engine = (index, index.as_query_engine(similarity_top_k=5))
+        return self._query_engine[1]
+    
     def answer_question(self, state: Dict[str, Any], question: str) -> Dict[str, Any]:
         """Answer a question about the codebase.
         
@@ -74,34 +166,112 @@ class QAAgent:
         Returns:
             Answer with metadata
         """
-        # Get the index from the state
-        index = state["code_index"]
+        return asyncio.run(self.aanswer_question(state, question))
+    
+    async def aanswer_question(
+        self,
+        state: Dict[str, Any],
+        question: str,
+        query_engine: Optional[RetrieverQueryEngine] = None,
+        embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """Answer a question about the codebase asynchronously.
+        
+        Answers are served from the cache when the same (or a closely
+        paraphrased) question was already answered for this repository, or
+        for another repository from nearly the same code chunks.
+        
+        Args:
+            state: Current state of the workflow
+            question: Question to answer
+            query_engine: Query engine to use; defaults to the shared engine
+                for the code index
+            embedding: Precomputed embedding of the question; computed on
+                demand if not given
+            
+        Returns:
+            Answer with metadata
+        """
+        # The embedding made for the cache lookup is reused by the retrieval
+        query_embedding = embedding
+        
+        async def embed(query: str) -> List[float]:
+            nonlocal query_embedding
+            if query_embedding is None:
+                query_embedding = await Settings.embed_model.aget_query_embedding(query)
+            return query_embedding
         
-        # Create query engine
-        query_engine = index.as_query_engine(similarity_top_k=5)
+        async def execute_query() -> Dict[str, Any]:
+            engine = query_engine or self._get_query_engine(state["code_index"])
+            query_bundle = QueryBundle(query_str=question, embedding=await embed(question))
+            nodes = await engine.aretrieve(query_bundle)
+            
+            async def synthesize() -> Dict[str, Any]:
+                async with self.config.llm_limiter:
+                    response = await engine.asynthesize(query_bundle, nodes)
+                return self._format_answer(response)
+            
+            if self.cache is None or not self.cache_across_repositories:
+                return await synthesize()
+            
+            answer = await self.cache.aget_or_compute(
+                "qa",
+                "",
+                question,
+                synthesize,
+                embed=embed,
+                signature={node.node.hash for node in nodes}
+            )
+            # Point the sources at this repository's copy of the code
+            return dict(answer, sources=self._format_sources(nodes))
         
-        # Execute query
-        response = query_engine.query(question)
+        if self.cache is None or self.repo_fingerprint is None:
+            return await execute_query()
         
+        return await self.cache.aget_or_compute(
+            "qa",
+            self.repo_fingerprint,
+            question,
+            execute_query,
+            embed=embed
+        )
+    
+    def _format_answer(self, response: Response) -> Dict[str, Any]:
+        """Convert a query engine response into an answer.
+        
+        Args:
+            response: Response from the query engine
+            
+        Returns:
+            Answer with metadata
+        """
         # Format answer
-        answer = {
+        return {
             "text": response.response,
-            "sources": [],
+            "sources": self._format_sources(getattr(response, "source_nodes", ())),
             "confidence": response.metadata.get("confidence", 0.8)
         }
+    
+    def _format_sources(self, nodes: Iterable[NodeWithScore]) -> List[Dict[str, Any]]:
+        """Describe the code chunks an answer is based on.
+        
+        Args:
+            nodes: Retrieved nodes
+            
+        Returns:
+            Sources with file path, score and an excerpt
+        """
+        sources = []
+        for node in nodes:
+            if hasattr(node, "metadata") and "file_path" in node.metadata:
+                source = {
+                    "file_path": node.metadata["file_path"],
+                    "score": node.score if hasattr(node, "score") else None,
+                    "excerpt": node.text[:200] + "..." if len(node.text) > 200 else node.text
+                }
+                sources.append(source)
         
-        # Extract source information if available
-        if hasattr(response, "source_nodes"):
-            for node in response.source_nodes:
-                if hasattr(node, "metadata") and "file_path" in node.metadata:
-                    source = {
-                        "file_path": node.metadata["file_path"],
-                        "score": node.score if hasattr(node, "score") else None,
-                        "excerpt": node.text[:200] + "..." if len(node.text) > 200 else node.text
-                    }
-                    answer["sources"].append(source)
-        
-        return answer
+        return sources
     
     def add_questions(self, state: Dict[str, Any], questions: List[str]) -> Dict[str, Any]:
         """Add questions to the state.
@@ -7,15 +7,35 @@ This agent is responsible for:
 3. Providing actionable recommendations for code quality
 """
 
+import asyncio
 import os
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import json
 
 from langchain.schema import HumanMessage
+from llama_index.core import Response
 from llama_index.core import VectorStoreIndex
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.settings import Settings
 
 from utils.config import AgentConfig
+from utils.llm_cache import SemanticLLMCache
+
+
+# Queries for the different types of refactoring opportunities, with the
+# category each one's suggestion is reported under
+REFACTORING_QUERIES: List[Tuple[str, str]] = [
+    ("Identify code duplication and suggest ways to reduce redundancy in this codebase", "Code duplication"),
+    ("Find complex methods or functions that should be simplified or broken down", "Complex functions"),
+    ("Identify performance bottlenecks or inefficient code patterns", "Performance"),
+    ("Suggest improvements to the code architecture or organization", "Architecture and organization"),
+    ("Find potential bugs or error-prone patterns in the code", "Potential bugs"),
+    ("Identify violations of coding standards or best practices", "Coding standards"),
+    ("Suggest improvements to error handling and logging", "Error handling and logging"),
+    ("Identify opportunities to improve test coverage or testing approach", "Testing")
+]
 
 
 class RefactoringAgent:
@@ -28,10 +48,36 @@ class RefactoringAgent:
             config: Configuration for the agent
         """
         self.config = config
+        self._query_engine: Optional[Tuple[VectorStoreIndex, RetrieverQueryEngine]] = None
+        
+        # The refactoring queries are the same for every repository, so
+        # cached suggestions are shared across repositories and only reused
+        # for the same query when the retrieved code chunks match
+        agent_config = config.agent_configs["refactoring"]
+        self.cache = None
+        if agent_config.get("cache_responses", True):
+            cache_dir = Path(config.cache_dir or Path(config.output_dir) / ".cache")
+            self.cache = SemanticLLMCache(
+                cache_dir / "llm_responses.sqlite",
+                ttl=agent_config.get("cache_ttl"),
+                signature_threshold=agent_config.get("cache_signature_threshold", 0.8),
+                scope=config.cache_scope
+            )
         
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the refactoring agent.
         
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            Updated state
+        """
+        return asyncio.run(self.arun(state))
+    
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the refactoring agent asynchronously.
+        
         Args:
             state: Current state of the workflow
             
@@ -44,7 +90,7 @@ class RefactoringAgent:
                 return state
             
             # Generate refactoring suggestions
-            suggestions = self.generate_refactoring_suggestions(state)
+            suggestions = await self._agenerate_refactoring_suggestions(state)
             state["refactoring_suggestions"] = suggestions
             
             # Save suggestions to file
@@ -68,56 +114,127 @@ class RefactoringAgent:
         Returns:
             List of refactoring suggestions
         """
-        suggestions = []
+        return asyncio.run(self._agenerate_refactoring_suggestions(state))
+    
+    async def _agenerate_refactoring_suggestions(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Generate refactoring suggestions with the queries issued concurrently.
+        
+        Each query is an independent LLM round-trip, so they are awaited
+        together, at most max_concurrency at a time. A failed query is
+        reported in the state errors without discarding the other suggestions.
+        
+        The queries are embedded in one batch and their code context is
+        retrieved first; a suggestion cached for the same query over nearly
+        the same code chunks is reused instead of calling the LLM. Cached
+        suggestions are only looked up by exact query: the queries are a
+        fixed set, so a semantic match could only return another category's
+        suggestion.
         
+        Args:
+            state: Current state of the workflow
+            
+        Returns:
+            List of refactoring suggestions
+        """
         # Use the index to find code smells and refactoring opportunities
-        index = state["code_index"]
-        query_engine = index.as_query_engine(similarity_top_k=10)
-        
-        # Define queries for different types of refactoring opportunities
-        refactoring_queries = [
-            "Identify code duplication and suggest ways to reduce redundancy in this codebase",
-            "Find complex methods or functions that should be simplified or broken down",
-            "Identify performance bottlenecks or inefficient code patterns",
-            "Suggest improvements to the code architecture or organization",
-            "Find potential bugs or error-prone patterns in the code",
-            "Identify violations of coding standards or best practices",
-            "Suggest improvements to error handling and logging",
-            "Identify opportunities to improve test coverage or testing approach"
-        ]
+        query_engine = self._get_query_engine(state["code_index"])
         
         # Limit the number of suggestions based on configuration
-        max_suggestions = self.config.agent_configs["refactoring"]["max_suggestions"]
+        agent_config = self.config.agent_configs["refactoring"]
+        queries = REFACTORING_QUERIES[:agent_config["max_suggestions"]]
+        semaphore = asyncio.Semaphore(agent_config.get("max_concurrency", 8))
         
-        # Process queries to generate suggestions
-        for query in refactoring_queries:
-            response = query_engine.query(query)
-            
-            # Extract suggestions from the response
-            suggestion = {
-                "category": query.split("and")[0].replace("Identify", "").replace("Find", "").strip(),
-                "description": response.response,
-                "confidence": response.metadata.get("confidence", 0.7) if hasattr(response, "metadata") else 0.7,
-                "sources": []
-            }
-            
-            # Extract source information if available
-            if hasattr(response, "source_nodes"):
-                for node in response.source_nodes:
-                    if hasattr(node, "metadata") and "file_path" in node.metadata:
-                        source = {
-                            "file_path": node.metadata["file_path"],
-                            "score": node.score if hasattr(node, "score") else None,
-                        }
-                        suggestion["sources"].append(source)
+        embeddings = await Settings.embed_model.aget_text_embedding_batch(
+            [query for query, _ in queries]
+        )
+        
+        async def query_suggestion(query: str, category: str, embedding: List[float]) -> Dict[str, Any]:
+            async with semaphore:
+                query_bundle = QueryBundle(query_str=query, embedding=embedding)
+                nodes = await query_engine.aretrieve(query_bundle)
+                
+                async def execute_query() -> Dict[str, Any]:
+                    async with self.config.llm_limiter:
+                        response = await query_engine.asynthesize(query_bundle, nodes)
+                    return self._make_suggestion(category, response)
+                
+                if self.cache is None:
+                    return await execute_query()
+                
+                suggestion = await self.cache.aget_or_compute(
+                    "refactoring",
+                    "",
+                    query,
+                    execute_query,
+                    signature={node.node.hash for node in nodes}
+                )
+                # Point the sources at this repository's copy of the code
+                return dict(suggestion, sources=self._format_sources(nodes))
+        
+        results = await asyncio.gather(
+            *(
+                query_suggestion(query, category, embedding)
+                for (query, category), embedding in zip(queries, embeddings)
+            ),
+            return_exceptions=True
+        )
+        
+        suggestions = []
+        for (query, _), result in zip(queries, results):
+            if isinstance(result, Exception):
+                state["errors"].append(f"Refactoring query error ({query}): {str(result)}")
+            else:
+                suggestions.append(result)
+        
+        return suggestions
+    
+    def _get_query_engine(self, index: VectorStoreIndex) -> RetrieverQueryEngine:
+        """Return the query engine for an index, creating it once per index.
+        
+        Args:
+            index: Index of the codebase
             
-            suggestions.append(suggestion)
+        Returns:
+            Query engine shared by all refactoring queries against the index
+        """
+        if self._query_engine is None or self._query_engine[0] is not index:
+            self._query_engine = (index, index.as_query_engine(similarity_top_k=10))
+        return self._query_engine[1]
+    
+    def _make_suggestion(self, category: str, response: Response) -> Dict[str, Any]:
+        """Build a suggestion from the response to a refactoring query.
+        
+        Args:
+            category: Category of the refactoring query
+            response: Response from the query engine
             
-            # Check if we've reached the maximum number of suggestions
-            if len(suggestions) >= max_suggestions:
-                break
+        Returns:
+            Refactoring suggestion
+        """
+        # Extract suggestions from the response
+        metadata = getattr(response, "metadata", None) or {}
+        return {
+            "category": category,
+            "description": response.response,
+            "confidence": metadata.get("confidence", 0.7),
+            "sources": self._format_sources(getattr(response, "source_nodes", ()))
+        }
+    
+    def _format_sources(self, nodes: Iterable[NodeWithScore]) -> List[Dict[str, Any]]:
+        """Describe the files a suggestion is based on.
         
-        return suggestions
+        Args:
+            nodes: Retrieved nodes, best ranked first
+            
+        Returns:
+            Sources listing each file once with its best-ranked chunk's score
+        """
+        sources = {}
+        for node in nodes:
+            file_path = getattr(node, "metadata", {}).get("file_path")
+            if file_path is not None and file_path not in sources:
+                sources[file_path] = {"file_path": file_path, "score": getattr(node, "score", None)}
+        return list(sources.values())
     
     def save_suggestions(self, state: Dict[str, Any]) -> None:
         """Save refactoring suggestions to a file.
@@ -152,5 +269,11 @@ class RefactoringAgent:
         content.append("3. **Incremental**: Make changes incrementally rather than all at once")
         content.append("4. **Review**: Have changes reviewed by peers to catch potential issues\n")
         
+        # Write the lines as they are instead of joining them into a second
+        # copy of the document
         with open(suggestions_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(content))
+            lines = iter(content)
+            f.write(next(lines))
+            for line in lines:
+                f.write("\n")
+                f.write(line)
@@ -7,23 +7,43 @@ This agent is responsible for:
 3. Indexing the files for further processing
 """
 
+import hashlib
 import os
 import tempfile
-import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
+from urllib.parse import quote, urlsplit, urlunsplit
 
 import gitlab
 import git
 from llama_index.core import SimpleDirectoryReader, Document
-from llama_index.core import VectorStoreIndex
-from llama_index.core.settings import Settings
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.node_parser import SentenceSplitter
 
 from utils.config import AgentConfig
+from utils.file_reader import DEFAULT_MAX_WORKERS, is_binary
+from utils.model_settings import configure_settings
+
+
+# Number of files read and inserted into the index at a time
+INDEX_BATCH_SIZE = 256
+
+# Only the tip of the default branch is analyzed, so skip the history, other
+# branches and tags, and let git fetch the blobs needed for the checkout
+CLONE_OPTIONS = ["--depth=1", "--filter=blob:none", "--single-branch", "--no-tags"]
+
+# Fail instead of waiting for credentials on a terminal when they're rejected
+CLONE_ENV = {"GIT_TERMINAL_PROMPT": "0"}
 
 
 class RepoManager:
-    """Agent for managing repository operations."""
+    """Agent for managing repository operations.
+    
+    Use it as a context manager to remove the cloned repository once the
+    workflow is done with it.
+    """
     
     def __init__(self, config: AgentConfig):
         """Initialize the RepoManager agent.
@@ -33,6 +53,10 @@ class RepoManager:
         """
         self.config = config
         self.temp_dir = None
+        self._temp_dir: Optional[tempfile.TemporaryDirectory] = None
+        # Extensions are compared lowercased
+        self.include_extensions = frozenset(ext.lower() for ext in config.include_extensions)
+        self.exclude_directories = config.exclude_directories
     
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the repository manager agent.
@@ -47,13 +71,20 @@ class RepoManager:
             # Clone the repository
             repo_path = self.clone_repository(state["repo_url"])
             state["repo_path"] = repo_path
+            state["commit_sha"] = git.Repo(repo_path).head.commit.hexsha
             
             # Get list of files
             file_list = self.get_file_list(repo_path)
             state["file_list"] = file_list
             
-            # Index files for code understanding
-            index = self.index_files(repo_path, file_list)
+            # Index files for code understanding, reusing the index persisted
+            # for this commit if there is one
+            index = self.index_files(
+                repo_path,
+                file_list,
+                state.setdefault("unreadable_files", set()),
+                persist_dir=self.get_persist_dir(state["repo_url"], state["commit_sha"])
+            )
             state["code_index"] = index
             
             # Update status
@@ -74,8 +105,15 @@ class RepoManager:
         Returns:
             Path to the cloned repository
         """
-        # Create temporary directory
-        self.temp_dir = tempfile.mkdtemp()
+        # Create temporary directory, replacing the previous clone's. Unless
+        # cleanup is disabled it is removed on cleanup() or, failing that,
+        # when it's garbage collected or the interpreter exits.
+        self.cleanup()
+        if self.config.agent_configs["repo_manager"].get("cleanup", True):
+            self._temp_dir = tempfile.TemporaryDirectory(prefix="codeinsight-")
+            self.temp_dir = self._temp_dir.name
+        else:
+            self.temp_dir = tempfile.mkdtemp(prefix="codeinsight-")
         
         # Check if GitLab token is required
         if "gitlab" in repo_url.lower():
@@ -107,20 +145,52 @@ class RepoManager:
             project = gl.projects.get(project_path)
             
             # Clone repository using the GitLab token
-            repo_url_with_token = repo_url.replace(
-                "https://", 
-                f"https://oauth2:{os.environ['GITLAB_TOKEN']}@"
-            )
-            git.Repo.clone_from(repo_url_with_token, self.temp_dir)
+            token = os.environ["GITLAB_TOKEN"]
+            try:
+                git.Repo.clone_from(
+                    self.authenticated_url(repo_url, token),
+                    self.temp_dir,
+                    env=CLONE_ENV,
+                    multi_options=CLONE_OPTIONS
+                )
+            except git.GitCommandError as e:
+                # The failed command line contains the token
+                message = str(e).replace(quote(token, safe=""), "***").replace(token, "***")
+                raise RuntimeError(message) from None
         else:
             # Direct clone for public repositories
-            git.Repo.clone_from(repo_url, self.temp_dir)
+            git.Repo.clone_from(repo_url, self.temp_dir, env=CLONE_ENV, multi_options=CLONE_OPTIONS)
         
         return self.temp_dir
     
+    @staticmethod
+    def authenticated_url(repo_url: str, token: str) -> str:
+        """Add a GitLab token to an HTTP(S) repository URL.
+        
+        Any credentials already in the URL are replaced. Other URLs, such as
+        SSH ones, are returned unchanged since they authenticate by key.
+        
+        Args:
+            repo_url: URL of the repository
+            token: GitLab personal access token
+            
+        Returns:
+            URL to clone the repository with
+        """
+        parts = urlsplit(repo_url)
+        if parts.scheme not in ("http", "https"):
+            return repo_url
+        
+        host = parts.netloc.rpartition("@")[2]
+        return urlunsplit(parts._replace(netloc=f"oauth2:{quote(token, safe='')}@{host}"))
+    
     def get_file_list(self, repo_path: str) -> List[str]:
         """Get a list of files in the repository.
         
+        Directories are scanned with os.scandir, whose entries carry the file
+        type from the directory listing, in the same top-down order as
+        os.walk. Scanning stops as soon as max_files files are found.
+        
         Args:
             repo_path: Path to the repository
             
@@ -128,67 +198,248 @@ class RepoManager:
             List of file paths relative to the repository
         """
         file_list = []
-        repo_path_obj = Path(repo_path)
+        max_files = self.config.max_files
         
-        for root, dirs, files in os.walk(repo_path):
-            # Skip excluded directories
-            dirs[:] = [d for d in dirs if d not in self.config.exclude_directories]
+        # Stack of (absolute directory, relative prefix) still to scan
+        stack = [(repo_path, "")]
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
             
-            for file in files:
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, repo_path)
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                
+                if is_dir:
+                    # Skip excluded directories; like os.walk, symlinked
+                    # directories are not followed
+                    if entry.name not in self.exclude_directories and not entry.is_symlink():
+                        subdirs.append((entry.path, prefix + entry.name + os.sep))
+                    continue
                 
                 # Check if file extension should be included
-                ext = os.path.splitext(file)[1].lower()
-                if ext in self.config.include_extensions:
-                    file_list.append(rel_path)
+                ext = os.path.splitext(entry.name)[1].lower()
+                if ext in self.include_extensions:
+                    # Interned so every agent keying on the path shares one string
+                    file_list.append(sys.intern(prefix + entry.name))
+                    if len(file_list) >= max_files:
+                        return file_list
+            
+            # Visit subdirectories in listing order
+            stack.extend(reversed(subdirs))
         
-        # Limit number of files if needed
-        return file_list[:self.config.max_files]
+        return file_list
     
-    def index_files(self, repo_path: str, file_list: List[str]) -> VectorStoreIndex:
+    def get_persist_dir(self, repo_url: str, commit_sha: str) -> Optional[Path]:
+        """Get the directory the index of the cloned commit is persisted in.
+        
+        Indexes live under <cache_dir>/index/<key>/<commit SHA>, where the key
+        covers the repository URL and the settings that shape the index, so
+        an index is only reused for the same files chunked the same way.
+        
+        Args:
+            repo_url: URL of the repository
+            commit_sha: SHA of the cloned commit
+            
+        Returns:
+            Persistence directory, or None if index persistence is disabled
+        """
+        if not self.config.agent_configs["repo_manager"].get("persist_index", True):
+            return None
+        
+        settings = "\n".join([
+            repo_url,
+            str(self.config.max_files),
+            str(self.config.chunk_size),
+            str(self.config.chunk_overlap),
+            getattr(self.config.embed_model, "model_name", ""),
+            " ".join(sorted(self.include_extensions)),
+            " ".join(sorted(self.exclude_directories))
+        ])
+        key = hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+        
+        cache_dir = Path(self.config.cache_dir or Path(self.config.output_dir) / ".cache")
+        return cache_dir / "index" / key / commit_sha
+    
+    def index_files(
+        self,
+        repo_path: str,
+        file_list: List[str],
+        unreadable_files: Optional[Set[str]] = None,
+        persist_dir: Optional[Path] = None
+    ) -> VectorStoreIndex:
         """Index the repository files for semantic search.
         
+        Files are read on a thread pool so their I/O latency overlaps, in
+        batches of INDEX_BATCH_SIZE files indexed in file list order. Each
+        file is read in binary mode with a single read and decoded in one go,
+        skipping the text layer's buffering and incremental decoding. Files
+        larger than max_file_bytes or that look binary are not indexed.
+        
+        With a persist_dir, an index already persisted there is loaded
+        without reading or embedding anything. Otherwise the most recently
+        persisted index for another commit of the repository is refreshed,
+        so only new and changed files are embedded, and the result is
+        persisted to persist_dir.
+        
         Args:
             repo_path: Path to the repository
             file_list: List of files to index
+            unreadable_files: Optional set collecting files that couldn't be read
+            persist_dir: Optional directory to load the index from or persist it to
             
         Returns:
             Index of the files
         """
-        documents = []
-        repo_path_obj = Path(repo_path)
+        repo_prefix = os.path.join(repo_path, "")
+        max_file_bytes = self.config.max_file_bytes
         
-        for file_path in file_list:
-            abs_path = repo_path_obj / file_path
-            
+        def read_file(file_path: str) -> Optional[str]:
             try:
-                with open(abs_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                doc = Document(
-                    text=content,
-                    metadata={
-                        "file_path": file_path,
-                        "file_type": os.path.splitext(file_path)[1],
-                        "file_name": os.path.basename(file_path)
-                    }
-                )
-                documents.append(doc)
-            except Exception as e:
+                with open(repo_prefix + file_path, 'rb', buffering=0) as f:
+                    # Skip oversized files before reading them and binary
+                    # files before decoding them
+                    if os.fstat(f.fileno()).st_size > max_file_bytes:
+                        data = None
+                    else:
+                        data = f.readall()
+                if data is None or is_binary(data):
+                    # Remember them so later agents don't load them either
+                    if unreadable_files is not None:
+                        unreadable_files.add(file_path)
+                    return None
+                content = data.decode('utf-8')
+                # Translate newlines as text mode would
+                if '\r' in content:
+                    content = content.replace('\r\n', '\n').replace('\r', '\n')
+                return content
+            except OSError:
+                # Remember files that can't be opened so later agents don't
+                # try again
+                if unreadable_files is not None:
+                    unreadable_files.add(file_path)
+            except UnicodeDecodeError:
                 # Skip files that can't be read as text
-                continue
+                pass
+            return None
         
-        # Configure settings with LLM
-        Settings.llm = self.config.llm
+        # Configure settings with LLM and embedding model
+        configure_settings(self.config)
         
-        # Create index using the global settings
-        index = VectorStoreIndex.from_documents(documents)
+        # Files are split into uniformly sized chunks the same way files added
+        # later are
+        splitter = SentenceSplitter(
+            chunk_size=self.config.chunk_size,
+            chunk_overlap=self.config.chunk_overlap
+        )
+        
+        if persist_dir is not None and persist_dir.is_dir():
+            storage_context = StorageContext.from_defaults(persist_dir=str(persist_dir))
+            return load_index_from_storage(storage_context, transformations=[splitter])
+        
+        # Start from the latest index persisted for another commit, if any
+        previous_dir = self._latest_persist_dir(persist_dir)
+        if previous_dir is not None:
+            storage_context = StorageContext.from_defaults(persist_dir=str(previous_dir))
+            index = load_index_from_storage(storage_context, transformations=[splitter])
+        else:
+            index = VectorStoreIndex(nodes=[], transformations=[splitter])
+        
+        # Insert a batch at a time so only one batch of file content is held
+        # in memory. Documents whose content hash is unchanged are skipped
+        # and changed ones are re-embedded, like refresh_ref_docs but with
+        # each batch embedded together.
+        indexed = set()
+        with ThreadPoolExecutor(max_workers=max(1, min(DEFAULT_MAX_WORKERS, len(file_list)))) as executor:
+            for start in range(0, len(file_list), INDEX_BATCH_SIZE):
+                batch = file_list[start:start + INDEX_BATCH_SIZE]
+                documents = []
+                for file_path, content in zip(batch, executor.map(read_file, batch)):
+                    if content is None:
+                        continue
+                    document = self.make_document(file_path, content)
+                    indexed.add(document.id_)
+                    existing_hash = index.docstore.get_document_hash(document.id_)
+                    if existing_hash == document.hash:
+                        continue
+                    if existing_hash is not None:
+                        index.delete_ref_doc(document.id_, delete_from_docstore=True)
+                    documents.append(document)
+                
+                if documents:
+                    index.insert_nodes(splitter.get_nodes_from_documents(documents))
+                    for document in documents:
+                        index.docstore.set_document_hash(document.id_, document.hash)
+        
+        # Drop files that are no longer part of the repository
+        for ref_doc_id in set(index.ref_doc_info) - indexed:
+            index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+        
+        if persist_dir is not None:
+            index.storage_context.persist(persist_dir=str(persist_dir))
         
         return index
+    
+    @staticmethod
+    def _latest_persist_dir(persist_dir: Optional[Path]) -> Optional[Path]:
+        """Find the most recently persisted index next to a persistence directory.
         
-    def __del__(self):
-        """Clean up temporary directory when done."""
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            if self.config.agent_configs.get("repo_manager", {}).get("cleanup", True):
-                shutil.rmtree(self.temp_dir)
+        Args:
+            persist_dir: Persistence directory of the current commit
+            
+        Returns:
+            Directory of the latest index persisted for another commit, if any
+        """
+        if persist_dir is None or not persist_dir.parent.is_dir():
+            return None
+        
+        candidates = [
+            path for path in persist_dir.parent.iterdir()
+            if path.is_dir() and path != persist_dir
+        ]
+        return max(candidates, key=lambda path: path.stat().st_mtime, default=None)
+        
+    @staticmethod
+    def make_document(file_path: str, content: str) -> Document:
+        """Create the index document for a repository file.
+        
+        The relative file path doubles as the document ID so other agents can
+        tell which files are already indexed.
+        
+        Args:
+            file_path: Path of the file relative to the repository
+            content: Content of the file
+            
+        Returns:
+            Document for the file
+        """
+        return Document(
+            id_=file_path,
+            text=content,
+            metadata={
+                "file_path": file_path,
+                "file_type": os.path.splitext(file_path)[1],
+                "file_name": os.path.basename(file_path)
+            }
+        )
+    
+    def cleanup(self) -> None:
+        """Remove the cloned repository unless cleanup is disabled."""
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+    
+    def __enter__(self) -> "RepoManager":
+        """Enter a block that cleans up the cloned repository on exit."""
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Clean up the cloned repository."""
+        self.cleanup()
@@ -8,6 +8,7 @@ This agent is responsible for:
 """
 
 import os
+from collections import Counter
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 import json
@@ -29,6 +30,15 @@ class ReportAgent:
         """
         self.config = config
         
+        # Generator for each configurable report section
+        self._section_generators = {
+            "Overview": self._generate_overview_section,
+            "Architecture": self._generate_architecture_section,
+            "Key Components": self._generate_components_section,
+            "Dependencies": self._generate_dependencies_section,
+            "Code Quality": self._generate_code_quality_section
+        }
+        
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Run the report generation agent.
         
@@ -87,21 +97,15 @@ class ReportAgent:
             f"It covers the architecture, key components, dependencies, and overall code quality.\n"
         )
         
-        # Add sections based on the configuration
+        # Add sections based on the configuration, skipping unknown ones.
+        # Sections come back as lines so the whole report is joined once.
         for section in sections:
-            if section == "Overview":
-                report_sections.append(self._generate_overview_section(state))
-            elif section == "Architecture":
-                report_sections.append(self._generate_architecture_section(state))
-            elif section == "Key Components":
-                report_sections.append(self._generate_components_section(state))
-            elif section == "Dependencies":
-                report_sections.append(self._generate_dependencies_section(state))
-            elif section == "Code Quality":
-                report_sections.append(self._generate_code_quality_section(state))
+            generate_section = self._section_generators.get(section)
+            if generate_section is not None:
+                report_sections.extend(generate_section(state))
         
         # Add QA section
-        report_sections.append(self._generate_qa_section(state))
+        report_sections.extend(self._generate_qa_section(state))
         
         # Add conclusion
         report_sections.append("## Conclusion\n")
@@ -114,14 +118,14 @@ class ReportAgent:
         # Join all sections
         return "\n".join(report_sections)
     
-    def _generate_overview_section(self, state: Dict[str, Any]) -> str:
+    def _generate_overview_section(self, state: Dict[str, Any]) -> List[str]:
         """Generate the overview section of the report.
         
         Args:
             state: Current state of the workflow
             
         Returns:
-            Markdown section
+            Lines of the Markdown section
         """
         section = ["## Overview\n"]
         
@@ -137,28 +141,26 @@ class ReportAgent:
         section.append("### File Statistics\n")
         section.append(f"- Total files analyzed: {len(state['file_list'])}")
         
-        # Count files by type
-        file_types = {}
-        for file_path in state["file_list"]:
-            ext = os.path.splitext(file_path)[1].lower()
-            if ext:
-                file_types[ext] = file_types.get(ext, 0) + 1
+        # Count files by type. Like os.path.splitext, leading dots of the file
+        # name don't start an extension.
+        file_names = (file_path.rpartition(os.sep)[2].lstrip(".") for file_path in state["file_list"])
+        file_types = Counter("." + name.rpartition(".")[2].lower() for name in file_names if "." in name)
         
         if file_types:
             section.append("- File types:")
-            for ext, count in sorted(file_types.items(), key=lambda x: x[1], reverse=True):
+            for ext, count in file_types.most_common():
                 section.append(f"  - {ext}: {count}")
         
-        return "\n".join(section)
+        return section
     
-    def _generate_architecture_section(self, state: Dict[str, Any]) -> str:
+    def _generate_architecture_section(self, state: Dict[str, Any]) -> List[str]:
         """Generate the architecture section of the report.
         
         Args:
             state: Current state of the workflow
             
         Returns:
-            Markdown section
+            Lines of the Markdown section
         """
         section = ["## Architecture\n"]
         
@@ -166,16 +168,16 @@ class ReportAgent:
             architecture = state["understanding"]["architecture"]
             section.append(f"{architecture['analysis']}\n")
         
-        return "\n".join(section)
+        return section
     
-    def _generate_components_section(self, state: Dict[str, Any]) -> str:
+    def _generate_components_section(self, state: Dict[str, Any]) -> List[str]:
         """Generate the components section of the report.
         
         Args:
             state: Current state of the workflow
             
         Returns:
-            Markdown section
+            Lines of the Markdown section
         """
         section = ["## Key Components\n"]
         
@@ -183,16 +185,16 @@ class ReportAgent:
             components = state["understanding"]["components"]
             section.append(f"{components['list']}\n")
         
-        return "\n".join(section)
+        return section
     
-    def _generate_dependencies_section(self, state: Dict[str, Any]) -> str:
+    def _generate_dependencies_section(self, state: Dict[str, Any]) -> List[str]:
         """Generate the dependencies section of the report.
         
         Args:
             state: Current state of the workflow
             
         Returns:
-            Markdown section
+            Lines of the Markdown section
         """
         section = ["## Dependencies\n"]
         
@@ -200,16 +202,16 @@ class ReportAgent:
             dependencies = state["understanding"]["dependencies"]
             section.append(f"{dependencies['analysis']}\n")
         
-        return "\n".join(section)
+        return section
     
-    def _generate_code_quality_section(self, state: Dict[str, Any]) -> str:
+    def _generate_code_quality_section(self, state: Dict[str, Any]) -> List[str]:
         """Generate the code quality section of the report.
         
         Args:
             state: Current state of the workflow
             
         Returns:
-            Markdown section
+            Lines of the Markdown section
         """
         section = ["## Code Quality\n"]
         
@@ -217,16 +219,16 @@ class ReportAgent:
             code_quality = state["understanding"]["code_quality"]
             section.append(f"{code_quality['analysis']}\n")
         
-        return "\n".join(section)
+        return section
     
-    def _generate_qa_section(self, state: Dict[str, Any]) -> str:
+    def _generate_qa_section(self, state: Dict[str, Any]) -> List[str]:
         """Generate the Q&A section of the report.
         
         Args:
             state: Current state of the workflow
             
         Returns:
-            Markdown section
+            Lines of the Markdown section
         """
         section = ["## Questions and Answers\n"]
         
@@ -242,7 +244,7 @@ class ReportAgent:
                 
                 section.append("")  # Add empty line between Q&A pairs
         
-        return "\n".join(section)
+        return section
     
     def save_report(self, state: Dict[str, Any]) -> None:
         """Save the report to a file.
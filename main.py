@@ -5,10 +5,15 @@ Main entry point for the CodeInsight Agent application.
 
 import os
 import argparse
+import asyncio
+import dataclasses
+import hashlib
+import operator
 from pathlib import Path
-from typing import Dict, Any, List, TypedDict, Optional
+from typing import Annotated, Callable, Dict, Any, List, Set, TypedDict, Optional
 
 from langchain_openai import ChatOpenAI
+from llama_index.embeddings.openai import OpenAIEmbedding
 from langgraph.graph import END, StateGraph
 
 from agents.repo_agent import RepoManager
@@ -18,6 +23,12 @@ from agents.report_agent import ReportAgent
 from agents.documentation_agent import DocumentationAgent
 from agents.refactoring_agent import RefactoringAgent
 from utils.config import AgentConfig
+from utils.file_reader import MappedFile
+from utils.model_settings import configure_settings
+
+# Retries for rate-limited or failed API requests. The OpenAI clients back
+# off exponentially with jitter and honour Retry-After headers.
+API_MAX_RETRIES = 6
 
 def parse_args():
     """Parse command line arguments."""
@@ -59,21 +70,31 @@ def parse_args():
     )
     return parser.parse_args()
 
+def merge_status(current: str, update: str) -> str:
+    """Combine status updates from nodes, keeping an error once one occurred."""
+    return current if current == "error" else update
+
 class AgentState(TypedDict):
-    """Type definition for the agent state."""
+    """Type definition for the agent state.
+    
+    errors and status have reducers because parallel branches update them
+    in the same step.
+    """
     repo_path: Optional[str]
     repo_url: Optional[str]
+    commit_sha: Optional[str]
     code_index: Any
     file_list: List[str]
-    files_content: Dict[str, str]
+    files_content: Dict[str, MappedFile]
+    unreadable_files: Set[str]
     understanding: Dict[str, Any]
     questions: List[str]
     answers: Dict[str, str]
     report: Optional[str]
     documentation: Dict[str, Any]
     refactoring_suggestions: List[Dict[str, Any]]
-    errors: List[str]
-    status: str
+    errors: Annotated[List[str], operator.add]
+    status: Annotated[str, merge_status]
     output_dir: Optional[str]
 
 def create_initial_state() -> AgentState:
@@ -81,9 +102,11 @@ def create_initial_state() -> AgentState:
     return {
         "repo_path": None,
         "repo_url": None,
+        "commit_sha": None,
         "code_index": None,
         "file_list": [],
         "files_content": {},
+        "unreadable_files": set(),
         "understanding": {},
         "questions": [],
         "answers": {},
@@ -95,10 +118,65 @@ def create_initial_state() -> AgentState:
         "output_dir": None,
     }
 
-def define_graph(config: AgentConfig) -> StateGraph:
+# Nodes whose output each node needs. QA and refactoring only need the code
+# understanding, and the report and documentation only need the answers on
+# top of it, so those pairs run in parallel.
+NODE_DEPENDENCIES = {
+    "repo_manager_node": [],
+    "code_understanding_node": ["repo_manager_node"],
+    "qa_node": ["code_understanding_node"],
+    "refactoring_node": ["code_understanding_node"],
+    "report_node": ["qa_node"],
+    "documentation_node": ["qa_node"],
+}
+
+# Nodes producing the output of each task
+TASK_NODES = {
+    "all": ["report_node", "documentation_node", "refactoring_node"],
+    "understand": ["code_understanding_node"],
+    "qa": ["qa_node"],
+    "report": ["report_node"],
+    "docs": ["documentation_node"],
+    "refactor": ["refactoring_node"],
+}
+
+def make_node(run: Callable[[Dict[str, Any]], Dict[str, Any]], *output_keys: str) -> Callable:
+    """Wrap an agent's run method as a graph node.
+    
+    The agent works on a copy of the state and the node only returns the
+    keys the agent produces, along with its new errors and its status, so
+    parallel branches don't overwrite each other's updates. Coroutine run
+    methods make async nodes, which share the workflow's event loop; the
+    graph runs sync nodes on worker threads.
+    
+    Args:
+        run: Run method of the agent, sync or async
+        output_keys: State keys the agent produces
+        
+    Returns:
+        Node function returning the agent's state updates
+    """
+    def updates(result: Dict[str, Any]) -> Dict[str, Any]:
+        update = {key: result[key] for key in output_keys}
+        update["errors"] = result["errors"]
+        update["status"] = result["status"]
+        return update
+    
+    if asyncio.iscoroutinefunction(run):
+        async def async_node(state: Dict[str, Any]) -> Dict[str, Any]:
+            return updates(await run({**state, "errors": []}))
+        
+        return async_node
+    
+    def node(state: Dict[str, Any]) -> Dict[str, Any]:
+        return updates(run({**state, "errors": []}))
+    
+    return node
+
+def define_graph(config: AgentConfig, repo_agent: Optional[RepoManager] = None) -> StateGraph:
     """Define the LangGraph workflow."""
     # Initialize agents
-    repo_agent = RepoManager(config)
+    repo_agent = repo_agent or RepoManager(config)
     code_understanding_agent = CodeUnderstandingAgent(config)
     qa_agent = QAAgent(config)
     report_agent = ReportAgent(config)
@@ -108,45 +186,80 @@ def define_graph(config: AgentConfig) -> StateGraph:
     # Create graph with properly typed state schema
     workflow = StateGraph(AgentState)
     
-    # Add nodes with names that don't conflict with state keys
-    workflow.add_node("repo_manager_node", repo_agent.run)
-    workflow.add_node("code_understanding_node", code_understanding_agent.run)
-    workflow.add_node("qa_node", qa_agent.run)
-    workflow.add_node("report_node", report_agent.run)
-    workflow.add_node("documentation_node", documentation_agent.run)
-    workflow.add_node("refactoring_node", refactoring_agent.run)
-    
-    # Define edges
-    workflow.add_edge("repo_manager_node", "code_understanding_node")
-    workflow.add_edge("code_understanding_node", "qa_node")
-    workflow.add_edge("qa_node", "report_node")
-    workflow.add_edge("report_node", "documentation_node")
-    workflow.add_edge("documentation_node", "refactoring_node")
-    workflow.add_edge("refactoring_node", END)
-    
-    # Add conditional edges for specific tasks
-    def route_based_on_task(state):
-        if config.task == "understand":
-            return END if state["status"] == "understanding_complete" else "code_understanding_node"
-        elif config.task == "qa":
-            return END if state["status"] == "qa_complete" else "qa_node"
-        elif config.task == "report":
-            return END if state["status"] == "report_complete" else "report_node"
-        elif config.task == "docs":
-            return END if state["status"] == "documentation_complete" else "documentation_node"
-        elif config.task == "refactor":
-            return END if state["status"] == "refactoring_complete" else "refactoring_node"
-        return None
-    
-    if config.task != "all":
-        for node in ["code_understanding_node", "qa_node", "report_node", "documentation_node", "refactoring_node"]:
-            workflow.add_conditional_edges(node, route_based_on_task)
+    # Nodes with names that don't conflict with state keys
+    nodes = {
+        "repo_manager_node": make_node(
+            repo_agent.run, "repo_path", "commit_sha", "file_list", "code_index", "unreadable_files"
+        ),
+        "code_understanding_node": make_node(
+            code_understanding_agent.arun, "understanding", "files_content", "unreadable_files"
+        ),
+        "qa_node": make_node(qa_agent.arun, "questions", "answers"),
+        "report_node": make_node(report_agent.run, "report"),
+        "documentation_node": make_node(documentation_agent.run, "documentation"),
+        "refactoring_node": make_node(refactoring_agent.arun, "refactoring_suggestions"),
+    }
+    
+    # Only add the nodes the task needs, i.e. its output nodes and
+    # everything they depend on
+    included = set()
+    pending = list(TASK_NODES[config.task])
+    while pending:
+        name = pending.pop()
+        if name not in included:
+            included.add(name)
+            pending.extend(NODE_DEPENDENCIES[name])
+    
+    included = [name for name in nodes if name in included]
+    for name in included:
+        workflow.add_node(name, nodes[name])
+    
+    # Define edges; nodes nothing else depends on end the workflow, which
+    # finishes once all of its branches have
+    dependents = set()
+    for name in included:
+        for dependency in NODE_DEPENDENCIES[name]:
+            workflow.add_edge(dependency, name)
+            dependents.add(dependency)
+    for name in included:
+        if name not in dependents:
+            workflow.add_edge(name, END)
     
     # Set entry point
     workflow.set_entry_point("repo_manager_node")
     
     return workflow
 
+async def run_workflow(app: Any, initial_state: AgentState) -> Optional[Dict[str, Any]]:
+    """Run the workflow, reporting each node as soon as it finishes.
+    
+    The agents write their output files when their node completes, so
+    these are available while the remaining nodes are still running.
+    
+    Args:
+        app: Compiled workflow
+        initial_state: State to start the workflow with
+        
+    Returns:
+        Final state of the workflow
+    """
+    final_state = None
+    async for mode, chunk in app.astream(initial_state, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+            continue
+        
+        for node_name, update in chunk.items():
+            # Skip stream metadata entries
+            if node_name.startswith("__"):
+                continue
+            update = update or {}
+            print(f"Finished {node_name}: {update.get('status', 'unknown')}")
+            for error in update.get("errors", []):
+                print(f" - {error}")
+    
+    return final_state
+
 def main():
     """Main function to run the agent."""
     args = parse_args()
@@ -182,12 +295,24 @@ def main():
         output_dir=str(output_dir),
         model_name=args.model,
         task=args.task,
-        llm=ChatOpenAI(model=args.model)
+        llm=ChatOpenAI(
+            model=args.model,
+            max_retries=API_MAX_RETRIES,
+            # Route requests for the same repository to the same prompt cache,
+            # so the code context shared by the analysis prompts is reused
+            extra_body={"prompt_cache_key": hashlib.sha256(args.repo.encode("utf-8")).hexdigest()[:32]}
+        )
+    )
+    config = dataclasses.replace(
+        config,
+        embed_model=OpenAIEmbedding(
+            embed_batch_size=config.effective_embed_batch_size,
+            max_retries=API_MAX_RETRIES
+        )
     )
     
-    # Create and run graph
-    graph = define_graph(config)
-    app = graph.compile()
+    # Share one LLM and embedding model between all agents
+    configure_settings(config)
     
     # Create initial state
     initial_state = create_initial_state()
@@ -195,8 +320,13 @@ def main():
     initial_state["output_dir"] = str(output_dir)
     initial_state["status"] = "initialized"
     
-    # Run the workflow
-    final_state = app.invoke(initial_state)
+    # Create and run graph; the cloned repository is removed once it's done
+    with RepoManager(config) as repo_agent:
+        graph = define_graph(config, repo_agent)
+        app = graph.compile()
+        
+        # Run the workflow; LLM-bound branches run concurrently on one event loop
+        final_state = asyncio.run(run_workflow(app, initial_state))
     
     # Print summary
     print(f"\n\n{'='*50}")
@@ -0,0 +1,87 @@
+"""
+Tests for the AST writers of utils/java_ast_parser.py.
+
+These need tree-sitter and the Java grammar; set TREE_SITTER_JAVA_REPO to
+the tree-sitter-java repository if it isn't in one of the locations
+setup_tree_sitter searches. The tests are skipped when the grammar can't be
+set up.
+"""
+
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+from utils import java_ast_parser
+
+# Sources with syntax errors, so their trees have ERROR and MISSING nodes
+BROKEN_SOURCES = [
+    b"class A { void f() { int x = 1 @@ ; } }",
+    b"class B { # }",
+    b"class C { void g() { foo( } }",
+    "class D { int x = 1 § ; }".encode("utf-8"),
+    b"class E { int \x01 x; }",
+    b"}}} class F {",
+    b"class G { int y = 'ab\n'; }",
+    b"class H { int \xff x; }",
+    b"class I { int x = 1 \\ ; }",
+    b"class J { void h() { int y = 2 } }",
+]
+
+def node_summary(node, max_depth=2, depth=0):
+    """The summary write_node_json writes, as nested dicts"""
+    if depth > max_depth:
+        return {"type": node.type, "children": "..."}
+    return {
+        "type": node.type,
+        "text_length": node.end_byte - node.start_byte,
+        "start_point": node.start_point,
+        "end_point": node.end_point,
+        "children": [node_summary(child, max_depth, depth + 1) for child in node.children]
+    }
+
+class AstWriterTest(unittest.TestCase):
+    """Checks the streamed writers against tree-sitter and json.dumps"""
+
+    @classmethod
+    def setUpClass(cls):
+        if java_ast_parser.Parser is None:
+            raise unittest.SkipTest("tree-sitter is not installed")
+        try:
+            _, cls.parser, _ = java_ast_parser.setup_tree_sitter(os.environ.get("TREE_SITTER_JAVA_REPO"))
+        except Exception as e:
+            raise unittest.SkipTest(f"Java grammar not available: {e}")
+
+    def test_streamed_sexp_matches_tree_sitter(self):
+        for source in BROKEN_SOURCES:
+            with self.subTest(source=source):
+                root = self.parser.parse(source).root_node
+                self.assertTrue(root.has_error)
+
+                out = io.StringIO()
+                # Stream every tree rather than only the large ones
+                with mock.patch.object(java_ast_parser, "SEXP_DIRECT_MAX_BYTES", -1):
+                    java_ast_parser.write_sexp(root, out, flush_size=1)
+                self.assertEqual(out.getvalue(), root.sexp())
+
+    def test_streamed_sexp_writes_unexpected_characters(self):
+        root = self.parser.parse(b"class B { # }").root_node
+        out = io.StringIO()
+        with mock.patch.object(java_ast_parser, "SEXP_DIRECT_MAX_BYTES", -1):
+            java_ast_parser.write_sexp(root, out)
+        self.assertIn("(UNEXPECTED '#')", out.getvalue())
+
+    def test_node_json_matches_json_dumps(self):
+        for source in BROKEN_SOURCES:
+            for max_depth in (0, 2, 100):
+                with self.subTest(source=source, max_depth=max_depth):
+                    root = self.parser.parse(source).root_node
+                    out = io.StringIO()
+                    java_ast_parser.write_node_json(root, out, max_depth)
+                    self.assertEqual(
+                        out.getvalue(), json.dumps(node_summary(root, max_depth), indent=2)
+                    )
+
+if __name__ == "__main__":
+    unittest.main()
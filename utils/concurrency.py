@@ -0,0 +1,50 @@
+"""
+Concurrency limits for LLM requests.
+
+Agents running in parallel graph branches each issue several LLM requests
+at once. A limiter shared through the AgentConfig caps how many of them
+are in flight together, so the agents don't trip the provider's rate limits
+and fall into retry backoff.
+"""
+
+import asyncio
+import threading
+import weakref
+
+
+class ConcurrencyLimiter:
+    """Async context manager allowing a bounded number of concurrent holders.
+
+    asyncio semaphores belong to a single event loop, so one is created per
+    loop on first use. The limit therefore applies per event loop; the graph
+    runs all of its async nodes on one loop.
+    """
+
+    def __init__(self, max_concurrency: int):
+        """Initialize the limiter.
+
+        Args:
+            max_concurrency: Maximum number of concurrent holders per event loop
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self._semaphore().acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self._semaphore().release()
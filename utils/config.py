@@ -3,13 +3,22 @@ Configuration for the CodeInsight Agent.
 """
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional
 
 from langchain.schema.language_model import BaseLanguageModel
+from llama_index.core.base.embeddings.base import BaseEmbedding
 
-@dataclass
+from utils.concurrency import ConcurrencyLimiter
+
+@dataclass(frozen=True)
 class AgentConfig:
-    """Configuration for the CodeInsight Agent."""
+    """Configuration for the CodeInsight Agent.
+    
+    The configuration is immutable once created, so it can be shared by the
+    agents and used as a cache key; use dataclasses.replace to derive a
+    modified configuration.
+    """
     
     # Repository information
     repo_url: str
@@ -19,13 +28,22 @@ class AgentConfig:
     
     # Model configuration
     model_name: str = "gpt-4-turbo"
-    llm: Optional[BaseLanguageModel] = None
+    llm: Optional[BaseLanguageModel] = field(default=None, hash=False)
+    embed_model: Optional[BaseEmbedding] = field(default=None, hash=False)
+    
+    # Number of text chunks sent per embedding request, capped so a request
+    # stays within max_embed_tokens_per_request for chunks of chunk_size
+    embed_batch_size: int = 256
+    max_embed_tokens_per_request: int = 250000
+    
+    # Maximum number of LLM requests in flight across all agents
+    llm_max_concurrency: int = 8
     
     # Task to perform
     task: str = "all"
     
-    # Agent-specific configurations
-    agent_configs: Dict[str, Any] = field(default_factory=dict)
+    # Agent-specific configurations, completed with the defaults below
+    agent_configs: Mapping[str, Dict[str, Any]] = field(default_factory=dict, hash=False)
     
     # Default chunk size for code indexing
     chunk_size: int = 1000
@@ -34,29 +52,59 @@ class AgentConfig:
     # Maximum files to process
     max_files: int = 100
     
+    # Files larger than this are not loaded for analysis
+    max_file_bytes: int = 1024 * 1024
+    
+    # Directory for persistent caches (defaults to <output_dir>/.cache)
+    cache_dir: Optional[str] = None
+    
     # File extensions to include/exclude
-    include_extensions: list = field(default_factory=lambda: [
+    include_extensions: FrozenSet[str] = frozenset({
         ".py", ".js", ".ts", ".java", ".c", ".cpp", ".h", ".hpp",
         ".cs", ".go", ".rb", ".php", ".swift", ".kt", ".rs",
         ".html", ".css", ".jsx", ".tsx", ".vue", ".md", ".json",
         ".yml", ".yaml", ".toml", ".ini", ".sql"
-    ])
+    })
     
-    exclude_directories: list = field(default_factory=lambda: [
+    exclude_directories: FrozenSet[str] = frozenset({
         "node_modules", "venv", ".git", "__pycache__", ".idea", ".vscode",
         "build", "dist", "target", "bin", "obj", ".pytest_cache"
-    ])
+    })
+    
+    # Limiter shared by the agents, allowing llm_max_concurrency requests
+    llm_limiter: ConcurrencyLimiter = field(init=False, repr=False, compare=False, hash=False)
+    
+    @property
+    def effective_embed_batch_size(self) -> int:
+        """Embedding batch size after applying the per-request token budget."""
+        return max(1, min(self.embed_batch_size, self.max_embed_tokens_per_request // self.chunk_size))
+    
+    @property
+    def cache_scope(self) -> str:
+        """Identifies the models whose responses the LLM response caches hold."""
+        embed_model_name = getattr(self.embed_model, "model_name", None) or ""
+        return f"{self.model_name}\0{embed_model_name}"
     
     def __post_init__(self):
         """Initialize default agent configs if not provided."""
+        # The dataclass is frozen, so derived fields are set through object
+        object.__setattr__(self, "include_extensions", frozenset(self.include_extensions))
+        object.__setattr__(self, "exclude_directories", frozenset(self.exclude_directories))
+        object.__setattr__(self, "llm_limiter", ConcurrencyLimiter(self.llm_max_concurrency))
+        
         default_configs = {
             "repo_manager": {
                 "timeout": 300,
-                "cleanup": True
+                "cleanup": True,
+                "persist_index": True
             },
             "code_understanding": {
                 "max_files_to_analyze": 50,
-                "priority_files": ["README.md", "main.py", "index.js", "package.json"]
+                "max_total_bytes": 64 * 1024 * 1024,
+                "priority_files": ["README.md", "main.py", "index.js", "package.json"],
+                "context_top_k": 20,
+                "cache_responses": True,
+                "cache_ttl": 7 * 24 * 3600
             },
             "qa": {
                 "default_questions": [
@@ -65,7 +113,13 @@ class AgentConfig:
                     "What is the architecture of the application?",
                     "What are the entry points to the application?",
                     "How is the code organized?"
-                ]
+                ],
+                "max_concurrency": 8,
+                "cache_responses": True,
+                "cache_similarity_threshold": 0.95,
+                "cache_ttl": 7 * 24 * 3600,
+                "cache_across_repositories": True,
+                "cache_signature_threshold": 0.8
             },
             "report": {
                 "sections": ["Overview", "Architecture", "Key Components", "Dependencies", "Code Quality"]
@@ -75,16 +129,22 @@ class AgentConfig:
                 "generate_api_docs": True
             },
             "refactoring": {
-                "max_suggestions": 10
+                "max_suggestions": 10,
+                "max_concurrency": 8,
+                "cache_responses": True,
+                "cache_signature_threshold": 0.8,
+                "cache_ttl": 24 * 3600
             }
         }
         
-        # Update with user-provided configs
+        # Update with user-provided configs, without modifying the caller's
+        agent_configs = {key: dict(value) for key, value in self.agent_configs.items()}
         for key, value in default_configs.items():
-            if key not in self.agent_configs:
-                self.agent_configs[key] = value
+            if key not in agent_configs:
+                agent_configs[key] = value
             else:
-                self.agent_configs[key].update({
-                    k: v for k, v in default_configs[key].items()
-                    if k not in self.agent_configs[key]
+                agent_configs[key].update({
+                    k: v for k, v in value.items()
+                    if k not in agent_configs[key]
                 })
+        object.__setattr__(self, "agent_configs", MappingProxyType(agent_configs))
@@ -0,0 +1,50 @@
+"""
+JSON helpers that use orjson when it is installed.
+
+orjson is an optional dependency; without it the standard library json
+module is used. orjson.JSONDecodeError subclasses json.JSONDecodeError, so
+callers can catch the latter either way.
+"""
+
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document.
+    
+    Args:
+        data: JSON text or UTF-8 encoded bytes
+        
+    Returns:
+        Parsed object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(
+    obj: Any,
+    indent: bool = False,
+    default: Optional[Callable[[Any], Any]] = None
+) -> str:
+    """Serialize an object to a JSON string.
+    
+    Args:
+        obj: Object to serialize
+        indent: Whether to indent nested structures by two spaces
+        default: Called for objects that can't be serialized otherwise
+        
+    Returns:
+        JSON text
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None, default=default)
@@ -0,0 +1,174 @@
+"""
+File reading and writing helpers for the CodeInsight agents.
+"""
+
+import functools
+import mmap
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Default number of threads used for concurrent reads
+DEFAULT_MAX_WORKERS = 32
+
+# Number of leading bytes inspected when detecting binary files
+BINARY_PROBE_SIZE = 1024
+
+
+def is_binary(data: bytes) -> bool:
+    """Guess whether file content is binary from a NUL byte in its first bytes."""
+    return b"\0" in data[:BINARY_PROBE_SIZE]
+
+
+class MappedFile:
+    """Read-only memory-mapped file whose text is decoded on demand."""
+
+    __slots__ = ("mm", "size", "__weakref__")
+
+    def __init__(self, path: str):
+        """Map a file into memory.
+
+        Args:
+            path: Path to the file
+        """
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # Empty files can't be mapped
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def read(self) -> str:
+        """Decode the file content as UTF-8 text, replacing undecodable bytes."""
+        if self.mm is None:
+            return ""
+        return self.mm[:].decode("utf-8", "replace")
+    
+    def read_bytes(self) -> bytes:
+        """Return the raw file content without decoding it."""
+        if self.mm is None:
+            return b""
+        return self.mm[:]
+
+    def __str__(self) -> str:
+        return self.read()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def close(self) -> None:
+        """Release the mapping."""
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+
+# Mapped files shared between agents, dropped once nothing references them
+_mapped_files: "weakref.WeakValueDictionary[str, MappedFile]" = weakref.WeakValueDictionary()
+
+
+def map_file(path: str, max_bytes: Optional[int] = None) -> Optional[MappedFile]:
+    """Return a MappedFile for the path, reusing an existing mapping if any.
+
+    Args:
+        path: Path to the file
+        max_bytes: Files larger than this are skipped without being opened
+
+    Returns:
+        Mapped file, or None if the file is too large or looks binary
+    """
+    mapped = _mapped_files.get(path)
+    if mapped is not None and (mapped.mm is not None or not mapped.size):
+        return mapped
+
+    if max_bytes is not None and os.stat(path).st_size > max_bytes:
+        return None
+
+    mapped = MappedFile(path)
+    if mapped.mm is not None and is_binary(mapped.mm[:BINARY_PROBE_SIZE]):
+        mapped.close()
+        return None
+
+    _mapped_files[path] = mapped
+    return mapped
+
+
+def _apply_concurrently(
+    func: Callable[[str], T],
+    paths: Iterable[str],
+    max_workers: int
+) -> Iterator[Tuple[str, Optional[T]]]:
+    """Apply a file operation to several paths on a thread pool.
+
+    File system calls release the GIL, so a thread pool overlaps their I/O
+    latency.
+
+    Returns:
+        Iterator of (path, result) pairs in input order; result is None
+        for files the operation failed on
+    """
+    def apply_or_none(path: str) -> Optional[T]:
+        try:
+            return func(path)
+        except (OSError, ValueError):
+            return None
+
+    paths = list(paths)
+    if not paths:
+        return iter(())
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        results = list(executor.map(apply_or_none, paths))
+
+    return zip(paths, results)
+
+
+def map_files(
+    paths: Iterable[str],
+    max_bytes: Optional[int] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS
+) -> Iterator[Tuple[str, Optional[MappedFile]]]:
+    """Memory-map several files concurrently.
+
+    Args:
+        paths: Paths of the files to map
+        max_bytes: Files larger than this are skipped
+        max_workers: Maximum number of threads
+
+    Returns:
+        Iterator of (path, mapped file) pairs in input order; the mapped file
+        is None for files that couldn't be opened, are too large or look binary
+    """
+    return _apply_concurrently(functools.partial(map_file, max_bytes=max_bytes), paths, max_workers)
+
+
+def write_text_files(files: Dict[str, str], max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+    """Write several UTF-8 text files concurrently.
+    
+    Parent directories are created once per distinct directory before the
+    writes are submitted to a thread pool.
+    
+    Args:
+        files: Mapping of file paths to content
+        max_workers: Maximum number of writer threads
+        
+    Raises:
+        OSError: If a directory or file can't be written
+    """
+    if not files:
+        return
+    
+    for directory in {os.path.dirname(path) for path in files}:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def write(item: Tuple[str, str]) -> None:
+        path, content = item
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        # Consume the results so write errors are raised here
+        for _ in executor.map(write, files.items()):
+            pass
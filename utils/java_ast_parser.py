@@ -1,30 +1,99 @@
+import hashlib
+import io
+import itertools
+import json
+import logging
+import mmap
 import os
+import re
+import shutil
 import sys
-from pathlib import Path
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from tree_sitter import Language, Parser
+except ImportError:
+    # Reported by check_tree_sitter_installed when tree-sitter is needed
+    Language = Parser = None
+
+logger = logging.getLogger(__name__)
+
+JAVA_SUFFIX = '.java'
+
+# Per-file progress lines are written to stdout in batches of this many
+LOG_BATCH_SIZE = 256
+
+# Extensions of the grammar library on this platform; the first one is used
+# when building it
+if sys.platform == "win32":
+    LIB_EXTENSIONS = (".dll",)
+elif sys.platform == "darwin":  # macOS
+    LIB_EXTENSIONS = (".dylib", ".so")
+else:  # Linux and others
+    LIB_EXTENSIONS = (".so", ".dylib")
+
+# Language.build_library and Parser.set_language, used below, were removed
+# in tree-sitter 0.22
+TREE_SITTER_REQUIREMENT = "tree-sitter>=0.20,<0.22"
+
+# Buffer size of the export file, so the many small writes of an export
+# reach the file in large chunks
+EXPORT_BUFFER_SIZE = 1 << 20
+
+# Files at least this large are memory-mapped for parsing instead of read
+MMAP_THRESHOLD = 64 * 1024
+
+# Whether Parser.parse accepts memory-mapped sources; cleared the first time
+# it rejects one
+_mmap_parse_supported = True
+
+# Results of setup_tree_sitter, keyed by the repo_path argument
+_tree_sitter_setups = {}
+
+# Fingerprints of the grammar libraries whose parser passed its test parse
+_verified_libraries = set()
+
+# Parser and grammar fingerprint of an export_java_files worker process
+_worker_state = None
+
+# Directories never searched for Java sources (the same ones
+# AgentConfig.exclude_directories skips)
+DEFAULT_EXCLUDE_DIRS = frozenset([
+    "node_modules", "venv", ".git", "__pycache__", ".idea", ".vscode",
+    "build", "dist", "target", "bin", "obj", ".pytest_cache"
+])
 
 def find_tree_sitter_java_repo():
     """Find the tree-sitter-java repository in common locations"""
-    possible_locations = [
+    # Paths are normalized so each location is only checked once
+    possible_locations = dict.fromkeys([
         "tree-sitter-java",
-        "./tree-sitter-java", 
         "../tree-sitter-java",
-        "tree-sitter-java-master",
-        "./tree-sitter-java-master"
-    ]
+        "tree-sitter-java-master"
+    ])
     
     # Also check current directory for any folder containing 'tree-sitter-java'
-    current_dir = Path(".")
-    for item in current_dir.iterdir():
-        if item.is_dir() and "tree-sitter-java" in item.name.lower():
-            possible_locations.append(str(item))
+    with os.scandir(".") as entries:
+        for entry in entries:
+            if "tree-sitter-java" in entry.name.lower() and entry.is_dir():
+                possible_locations.setdefault(entry.name)
     
     for location in possible_locations:
-        if os.path.exists(location):
-            # Verify it's actually a tree-sitter-java repo
-            grammar_file = os.path.join(location, "grammar.js")
-            src_dir = os.path.join(location, "src")
-            if os.path.exists(grammar_file) and os.path.exists(src_dir):
-                return os.path.abspath(location)
+        # Verify it's actually a tree-sitter-java repo, with a single
+        # directory listing rather than a stat per required file
+        try:
+            with os.scandir(location) as entries:
+                found = {
+                    entry.name for entry in entries
+                    if (entry.name == "grammar.js" and entry.is_file())
+                    or (entry.name == "src" and entry.is_dir())
+                }
+        except OSError:
+            continue
+        if len(found) == 2:
+            return os.path.abspath(location)
     
     return None
 
@@ -54,30 +123,11 @@ def setup_tree_sitter_from_existing_repo(repo_path=None):
         if not os.path.exists(os.path.join(repo_path, file)):
             raise Exception(f"Required file not found: {file} in {repo_path}")
     
-    # Try to import tree-sitter
-    try:
-        from tree_sitter import Language, Parser
-    except ImportError:
-        raise Exception(
-            "tree-sitter package not found. Install it with:\n"
-            "pip install tree-sitter"
-        )
-    
     # Build the language library
     print("🔨 Building Java language library from repository...")
     
     try:
-        # Determine library extension based on platform
-        import platform
-        system = platform.system().lower()
-        if system == "windows":
-            lib_extension = ".dll"
-        elif system == "darwin":  # macOS
-            lib_extension = ".dylib"
-        else:  # Linux and others
-            lib_extension = ".so"
-        
-        lib_filename = f"java{lib_extension}"
+        lib_filename = f"java{LIB_EXTENSIONS[0]}"
         
         # Build the library
         Language.build_library(lib_filename, [repo_path])
@@ -94,9 +144,7 @@ def setup_tree_sitter_from_existing_repo(repo_path=None):
         
         # Test the parser
         test_code = b"public class Test { public static void main(String[] args) {} }"
-        tree = parser.parse(test_code)
-        
-        if tree.root_node.type != 'program':
+        if not parser_works(parser, lib_filename, test_code):
             raise Exception("Parser test failed - unexpected root node type")
         
         print("✓ Parser test successful!")
@@ -105,31 +153,28 @@ def setup_tree_sitter_from_existing_repo(repo_path=None):
     except Exception as e:
         raise Exception(f"Failed to build or load language: {e}")
 
+def parser_works(parser, lib_file, test_code):
+    """Check that a parser parses Java, running the test parse once per library build"""
+    fingerprint = grammar_fingerprint(lib_file)
+    if fingerprint in _verified_libraries:
+        return True
+    
+    if parser.parse(test_code).root_node.type != 'program':
+        return False
+    _verified_libraries.add(fingerprint)
+    return True
+
 def load_existing_library():
     """Try to load an existing java library file"""
-    import platform
-    system = platform.system().lower()
-    
-    if system == "windows":
-        possible_files = ["java.dll"]
-    elif system == "darwin":  # macOS
-        possible_files = ["java.dylib", "java.so"]
-    else:  # Linux and others
-        possible_files = ["java.so", "java.dylib"]
-    
-    for lib_file in possible_files:
+    for lib_file in (f"java{ext}" for ext in LIB_EXTENSIONS):
         if os.path.exists(lib_file):
             try:
-                from tree_sitter import Language, Parser
                 java_language = Language(lib_file, 'java')
                 parser = Parser()
                 parser.set_language(java_language)
                 
                 # Test with simple Java code
-                test_code = b"public class Test {}"
-                tree = parser.parse(test_code)
-                
-                if tree.root_node.type == 'program':
+                if parser_works(parser, lib_file, b"public class Test {}"):
                     print(f"✓ Successfully loaded existing library: {lib_file}")
                     return java_language, parser, lib_file
             except Exception as e:
@@ -138,63 +183,240 @@ def load_existing_library():
     
     return None
 
+def check_tree_sitter_installed():
+    """Check that a supported tree-sitter package is installed, without importing it"""
+    from importlib import metadata
+    
+    try:
+        version = metadata.version("tree-sitter")
+    except metadata.PackageNotFoundError:
+        raise Exception(
+            "tree-sitter package not found. Install it with:\n"
+            f"pip install '{TREE_SITTER_REQUIREMENT}'"
+        )
+    
+    major, minor = (int(part) for part in re.findall(r"\d+", version)[:2])
+    if (major, minor) >= (0, 22):
+        raise Exception(
+            f"tree-sitter {version} is not supported. Install a supported version with:\n"
+            f"pip install '{TREE_SITTER_REQUIREMENT}'"
+        )
+
 def setup_tree_sitter(repo_path=None):
-    """Main setup function"""
+    """Main setup function
+    
+    The language and parser are set up once per process and reused by
+    later calls.
+    """
+    if repo_path in _tree_sitter_setups:
+        return _tree_sitter_setups[repo_path]
+    
     print("🚀 Setting up tree-sitter for Java...")
+    check_tree_sitter_installed()
     
     # First, try to load existing library
     print("🔍 Checking for existing Java language library...")
     existing = load_existing_library()
     if existing:
+        _tree_sitter_setups[repo_path] = existing
         return existing
     
     print("📦 No existing library found, building from repository...")
-    return setup_tree_sitter_from_existing_repo(repo_path)
+    setup = setup_tree_sitter_from_existing_repo(repo_path)
+    _tree_sitter_setups[repo_path] = setup
+    return setup
 
-def parse_java_files(directory, repo_path=None):
+def find_java_files(directory, exclude_dirs=DEFAULT_EXCLUDE_DIRS):
+    """List the Java files in a directory, skipping directories named in `exclude_dirs`
+    
+    The tree is walked with os.scandir, whose entries carry their type from
+    the directory listing, so most entries need no extra stat call. Files
+    are listed in the same order as with os.walk, and like os.walk, symbolic
+    links to directories are not followed.
+    """
+    exclude_dirs = frozenset(exclude_dirs)
+    java_files = []
+    pending = [directory]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                subdirs = []
+                for entry in entries:
+                    name = entry.name
+                    if name.endswith(JAVA_SUFFIX) and entry.is_file():
+                        java_files.append(entry.path)
+                    elif name not in exclude_dirs and entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+        except OSError:
+            # Unreadable directories are skipped, as os.walk does
+            continue
+        pending.extend(reversed(subdirs))
+    return java_files
+
+def grammar_fingerprint(lib_path):
+    """Identify a grammar library by its path, size and modification time"""
+    lib_stat = os.stat(lib_path)
+    return f"{os.path.abspath(lib_path)}:{lib_stat.st_size}:{lib_stat.st_mtime_ns}".encode('utf-8')
+
+def content_cache_key(grammar_id, content):
+    """Cache key of a file's AST, covering the grammar as well as the content"""
+    key = hashlib.blake2b(grammar_id + b"\0", digest_size=20)
+    key.update(content)
+    return key.hexdigest()
+
+def open_source(filepath):
+    """Open a Java file for reading, hinting the kernel that it is read in full
+    
+    Sources are read sequentially and right away, so where posix_fadvise
+    is available the kernel is asked to read ahead aggressively. The file
+    is unbuffered: sources are read whole, straight into a bytes object
+    sized from fstat, so a read buffer would only be allocated for nothing.
+    """
+    f = open(filepath, 'rb', buffering=0)
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            # The advice is only a hint; some filesystems don't support it
+            pass
+    return f
+
+def parse_source(parser, f):
+    """Parse an open Java file, returning the tree and the source it was parsed from
+    
+    Large files are memory-mapped rather than read, so their content is
+    parsed straight from the page cache instead of being copied first. The
+    mapping is released once nothing references the source.
+    """
+    global _mmap_parse_supported
+    
+    if _mmap_parse_supported and os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return parser.parse(content), content
+        except TypeError:
+            # This version of the binding only parses bytes
+            _mmap_parse_supported = False
+            content = content[:]
+    else:
+        content = f.read()
+    return parser.parse(content), content
+
+class AstInfo:
+    """A parsed Java file: its paths, tree and the source it was parsed from"""
+    
+    __slots__ = ('file_path', 'relative_path', 'tree', 'root_node', 'source', 'cache_key')
+    
+    def __init__(self, file_path, relative_path, tree, source, cache_key=None):
+        self.file_path = file_path
+        self.relative_path = relative_path
+        self.tree = tree
+        self.root_node = tree.root_node
+        self.source = source
+        self.cache_key = cache_key
+
+def _flush_log(lines):
+    """Write buffered progress lines to stdout in one call"""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        lines.clear()
+
+def parse_java_files(directory, repo_path=None, max_workers=None, exclude_dirs=DEFAULT_EXCLUDE_DIRS,
+                     tree_sitter_setup=None, verbose=False):
     """Parse all Java files in a directory and return their ASTs"""
+    return list(iter_parsed_java_files(
+        directory, repo_path, max_workers, exclude_dirs=exclude_dirs,
+        tree_sitter_setup=tree_sitter_setup, verbose=verbose
+    ))
+
+def iter_parsed_java_files(directory, repo_path=None, max_workers=None, window=64,
+                           exclude_dirs=DEFAULT_EXCLUDE_DIRS, tree_sitter_setup=None, verbose=False):
+    """Parse the Java files in a directory, yielding their ASTs one at a time
+    
+    Files are read and parsed on a thread pool, with one parser per worker
+    thread since a parser can't be shared between threads. The tree-sitter
+    binding holds the GIL while parsing, so parses don't run in parallel;
+    the threads only overlap reading files with parsing. Trees can't be
+    sent between processes, which is why they are parsed here rather than
+    on a process pool like export_java_files does. At most `window`
+    files are parsed ahead of the consumer, so a streaming consumer such as
+    export_asts_to_file only holds a few trees at a time. Results keep the
+    directory walk order. Directories named in `exclude_dirs` are not
+    descended into. A `tree_sitter_setup` returned by setup_tree_sitter is
+    used instead of setting up again.
+    With `verbose`, each parsed file is listed, in batches of LOG_BATCH_SIZE
+    lines; files that fail to parse are logged as warnings.
+    """
     # Setup tree-sitter with Java support
-    try:
-        java_language, parser, lib_path = setup_tree_sitter(repo_path)
-        print(f"🎉 Tree-sitter setup successful! Using library: {lib_path}")
-    except Exception as e:
-        print(f"❌ Error setting up tree-sitter: {e}")
-        return []
+    if tree_sitter_setup is not None:
+        java_language, parser, lib_path = tree_sitter_setup
+    else:
+        try:
+            java_language, parser, lib_path = setup_tree_sitter(repo_path)
+            print(f"🎉 Tree-sitter setup successful! Using library: {lib_path}")
+        except Exception as e:
+            print(f"❌ Error setting up tree-sitter: {e}")
+            return
+    
+    # Cache keys cover the grammar library as well as the file content, so
+    # cached exports are invalidated when the grammar is rebuilt
+    grammar_id = grammar_fingerprint(lib_path)
     
-    asts = []
-    java_files_found = 0
+    parsed_count = 0
     
     print(f"\n📁 Scanning directory: {directory}")
+    java_files = find_java_files(directory, exclude_dirs)
     
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.java'):
-                filepath = os.path.join(root, file)
-                java_files_found += 1
+    worker = threading.local()
+    
+    def parse_file(filepath):
+        try:
+            thread_parser = getattr(worker, 'parser', None)
+            if thread_parser is None:
+                thread_parser = worker.parser = Parser()
+                thread_parser.set_language(java_language)
+            
+            # Parse the Java file from its raw bytes
+            with open_source(filepath) as f:
+                tree, content = parse_source(thread_parser, f)
+            return tree, content, content_cache_key(grammar_id, content), None
+        except Exception as e:
+            return None, None, None, e
+    
+    log_lines = []
+    # Names used for every file are bound to locals once. The walk yields
+    # paths under directory, so relative paths are a slice rather than a
+    # normalizing os.path.relpath call.
+    prefix_length = len(os.path.join(directory, ""))
+    make_ast_info = AstInfo
+    add_log_line = log_lines.append
+    warning = logger.warning
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parse_all = executor.map
+        for start in range(0, len(java_files), window):
+            batch = java_files[start:start + window]
+            for filepath, (tree, source, cache_key, error) in zip(batch, parse_all(parse_file, batch)):
+                if error is not None:
+                    warning("❌ Error parsing %s: %s", filepath, error)
+                    continue
                 
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Parse the Java file
-                    tree = parser.parse(bytes(content, 'utf8'))
-                    
-                    # Store AST with metadata
-                    ast_info = {
-                        'file_path': filepath,
-                        'relative_path': os.path.relpath(filepath, directory),
-                        'tree': tree,
-                        'root_node': tree.root_node
-                    }
-                    asts.append(ast_info)
-                    
-                    print(f"✅ Parsed: {os.path.relpath(filepath, directory)}")
-                    
-                except Exception as e:
-                    print(f"❌ Error parsing {filepath}: {e}")
-    
-    print(f"\n📊 Successfully parsed {len(asts)} out of {java_files_found} Java files")
-    return asts
+                # AST with metadata
+                ast_info = make_ast_info(filepath, filepath[prefix_length:], tree, source, cache_key)
+                parsed_count += 1
+                
+                if verbose:
+                    add_log_line(f"✅ Parsed: {ast_info.relative_path}")
+                    if len(log_lines) >= LOG_BATCH_SIZE:
+                        _flush_log(log_lines)
+                yield ast_info
+    
+    _flush_log(log_lines)
+    print(f"\n📊 Successfully parsed {parsed_count} out of {len(java_files)} Java files")
+
+# Bytes of a node's source decoded for its summary line, enough for the
+# characters shown
+SNIPPET_BYTES = 256
 
 def print_ast_summary(asts):
     """Print a summary of the parsed ASTs"""
@@ -207,73 +429,324 @@ def print_ast_summary(asts):
     print("="*60)
     
     for i, ast_info in enumerate(asts):
-        print(f"\n📄 {i+1}. File: {ast_info['relative_path']}")
-        root = ast_info['root_node']
+        print(f"\n📄 {i+1}. File: {ast_info.relative_path}")
+        root = ast_info.root_node
         print(f"   🌿 Root node type: {root.type}")
         print(f"   🔢 Child count: {root.child_count}")
-        print(f"   📏 Text length: {len(root.text)} bytes")
+        print(f"   📏 Text length: {root.end_byte - root.start_byte} bytes")
         
-        # Show first few child nodes with their types
+        # Show first few child nodes with their types. A cursor visits them
+        # without building node objects for all of the root's children.
         print("   🌱 Top-level elements:")
-        for j, child in enumerate(root.children[:5]):
-            # Get a clean representation of the node content
-            node_text = child.text.decode('utf-8').strip()
+        source = ast_info.source
+        cursor = root.walk()
+        has_child = cursor.goto_first_child()
+        for j in range(5):
+            if not has_child:
+                break
+            child = cursor.node
+            # Get a clean representation of the node content, decoding only
+            # the start of it rather than copying out the node's whole text
+            end = min(child.end_byte, child.start_byte + SNIPPET_BYTES)
+            node_text = source[child.start_byte:end].decode('utf-8', 'replace').strip()
             # Take first line only and limit length
             first_line = node_text.split('\n')[0]
             if len(first_line) > 50:
                 first_line = first_line[:47] + "..."
             
             print(f"      {j+1}. {child.type}: {repr(first_line)}")
+            has_child = cursor.goto_next_sibling()
         
         if root.child_count > 5:
             print(f"      ... and {root.child_count - 5} more children")
 
-def analyze_ast_node(node, depth=0, max_depth=2):
-    """Recursively analyze an AST node and return structured info"""
+def _point_json(point, pad):
+    """JSON of a point, laid out like json.dumps(..., indent=2)"""
+    return f"[\n{pad}  {point[0]},\n{pad}  {point[1]}\n{pad}]"
+
+def write_node_json(node, f, max_depth=2, depth=0, indent=0):
+    """Write a JSON summary of a node to a file, laid out like json.dumps(..., indent=2)
+    
+    Each node has its type, source length, start and end points and
+    children; nodes deeper than `max_depth` only have their type, with
+    "..." as children. The JSON is written node by node instead of building
+    nested dicts and the whole JSON string in memory first.
+    """
+    outer = "  " * indent
+    pad = outer + "  "
+    node_type = json.dumps(node.type)
     if depth > max_depth:
-        return {"type": node.type, "children": "..."}
-    
-    result = {
-        "type": node.type,
-        "text_length": len(node.text),
-        "start_point": node.start_point,
-        "end_point": node.end_point,
-        "children": []
-    }
+        f.write(f'{{\n{pad}"type": {node_type},\n{pad}"children": "..."\n{outer}}}')
+        return
+    
+    f.write(
+        f'{{\n{pad}"type": {node_type},\n'
+        f'{pad}"text_length": {node.end_byte - node.start_byte},\n'
+        f'{pad}"start_point": {_point_json(node.start_point, pad)},\n'
+        f'{pad}"end_point": {_point_json(node.end_point, pad)},\n'
+        f'{pad}"children": '
+    )
+    children = node.children
+    if not children:
+        f.write("[]")
+    else:
+        f.write("[")
+        for i, child in enumerate(children):
+            f.write(",\n" if i else "\n")
+            f.write(pad + "  ")
+            write_node_json(child, f, max_depth, depth + 1, indent + 2)
+        f.write(f"\n{pad}]")
+    f.write(f"\n{outer}}}")
+
+# Nodes spanning at most this many source bytes have their S-expression
+# built by tree-sitter in one call; larger ones are streamed
+SEXP_DIRECT_MAX_BYTES = 1 << 20
+
+def write_sexp(node, f, flush_size=4096):
+    """Write the S-expression of a node to a file, like node.sexp()
+    
+    Typical files are written with node.sexp(), which builds the text in C
+    without visiting nodes from Python. For large files the tree is walked
+    with a cursor and the text is written in small pieces instead, so their
+    S-expression is never held in memory as a whole.
+    """
+    if node.end_byte - node.start_byte <= SEXP_DIRECT_MAX_BYTES:
+        f.write(node.sexp())
+        return
     
-    for child in node.children:
-        result["children"].append(analyze_ast_node(child, depth + 1, max_depth))
+    cursor = node.walk()
+    # The cursor's field name is a method before tree-sitter 0.20.2 and a
+    # property since
+    if hasattr(cursor, 'current_field_name'):
+        current_field_name = cursor.current_field_name
+    else:
+        current_field_name = lambda: cursor.field_name
+    parts = []
+    # Whether each node on the path from the root opened a parenthesis
+    opened = []
+    
+    while True:
+        current = cursor.node
+        # Like node.sexp(), only named and missing nodes are written
+        visible = current.is_named or current.is_missing
+        if visible:
+            if parts or opened:
+                parts.append(" ")
+            field_name = current_field_name()
+            if field_name:
+                parts.append(f"{field_name}: ")
+            if current.is_missing:
+                node_type = current.type if current.is_named else f'"{current.type}"'
+                parts.append(f"(MISSING {node_type}")
+            elif current.type == "ERROR" and not current.child_count:
+                # Written as (UNEXPECTED c) with the character the lexer
+                # failed on, which only tree-sitter has; the node has no
+                # children, so its own S-expression is short
+                parts.append(current.sexp()[:-1])
+            else:
+                parts.append(f"({current.type}")
+        
+        if len(parts) >= flush_size:
+            f.write("".join(parts))
+            parts.clear()
+        
+        if cursor.goto_first_child():
+            opened.append(visible)
+            continue
+        
+        if visible:
+            parts.append(")")
+        while not cursor.goto_next_sibling():
+            if not opened:
+                f.write("".join(parts))
+                return
+            cursor.goto_parent()
+            if opened.pop():
+                parts.append(")")
+
+def write_cached_sexp(ast_info, f, cache_dir):
+    """Write the S-expression of a parsed file, reusing it from a cache
+    
+    S-expressions are cached in `cache_dir` by the hash of the file content
+    and grammar, so unchanged files are copied from the cache instead of
+    walking their tree again.
+    """
+    cache_key = ast_info.cache_key
+    if cache_key is None:
+        write_sexp(ast_info.root_node, f)
+        return
     
-    return result
+    cache_file = os.path.join(cache_dir, f"{cache_key}.sexp")
+    if not os.path.exists(cache_file):
+        # Write to a temporary file first so an interrupted export never
+        # leaves a truncated cache entry behind
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with open(fd, 'w', encoding='utf-8') as cache_out:
+                write_sexp(ast_info.root_node, cache_out)
+            os.replace(temp_path, cache_file)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    
+    with open(cache_file, 'r', encoding='utf-8') as cached:
+        shutil.copyfileobj(cached, f)
 
-def export_asts_to_file(asts, output_file='combined_ast.txt', format='sexp'):
-    """Export all ASTs to a text file in different formats"""
-    if not asts:
+def export_header(format):
+    """Header of an export file"""
+    return (
+        "COMBINED JAVA AST EXPORT\n"
+        "Generated by Java AST Parser\n"
+        f"Format: {format}\n"
+        + "="*60 + "\n\n"
+    )
+
+def file_header(index, file_path, relative_path):
+    """Header of a file's section in an export file"""
+    return (
+        f"FILE #{index+1}: {file_path}\n"
+        f"Relative path: {relative_path}\n"
+        + "-" * 60 + "\n"
+    )
+
+# Separator written after each file's section in an export file
+FILE_FOOTER = "\n\n" + "="*60 + "\n\n"
+
+def write_ast(ast_info, f, format, cache_dir=None):
+    """Write the representation of a parsed file in the given export format"""
+    if format == 'sexp':
+        f.write("S-Expression representation:\n")
+        if cache_dir is None:
+            write_sexp(ast_info.root_node, f)
+        else:
+            write_cached_sexp(ast_info, f, cache_dir)
+    elif format == 'json':
+        f.write("JSON representation:\n")
+        write_node_json(ast_info.root_node, f)
+
+def export_asts_to_file(asts, output_file='combined_ast.txt', format='sexp', cache_dir=None):
+    """Export all ASTs to a text file in different formats
+    
+    `asts` can be a list or an iterator such as iter_parsed_java_files(),
+    which is consumed one AST at a time. With a `cache_dir`, S-expressions
+    of unchanged files are reused from earlier exports.
+    """
+    asts = iter(asts)
+    first = next(asts, None)
+    if first is None:
         print("No ASTs to export")
         return
+    asts = itertools.chain([first], asts)
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("COMBINED JAVA AST EXPORT\n")
-        f.write("Generated by Java AST Parser\n")
-        f.write(f"Format: {format}\n")
-        f.write("="*60 + "\n\n")
+    with open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        f.write(export_header(format))
         
+        # Each file's footer goes out with the next file's header
+        footer = ""
         for i, ast_info in enumerate(asts):
-            f.write(f"FILE #{i+1}: {ast_info['file_path']}\n")
-            f.write(f"Relative path: {ast_info['relative_path']}\n")
-            f.write("-" * 60 + "\n")
-            
-            if format == 'sexp':
-                f.write("S-Expression representation:\n")
-                f.write(ast_info['root_node'].sexp())
-            elif format == 'json':
-                import json
-                f.write("JSON representation:\n")
-                ast_dict = analyze_ast_node(ast_info['root_node'])
-                f.write(json.dumps(ast_dict, indent=2))
-            
-            f.write("\n\n" + "="*60 + "\n\n")
+            f.write(footer + file_header(i, ast_info.file_path, ast_info.relative_path))
+            write_ast(ast_info, f, format, cache_dir)
+            footer = FILE_FOOTER
+        f.write(footer)
+    
+    print(f"💾 ASTs exported to: {output_file}")
+
+def _init_export_worker(lib_path):
+    """Load the grammar library built by the parent process in a worker process"""
+    global _worker_state
+    
+    parser = Parser()
+    parser.set_language(Language(lib_path, 'java'))
+    _worker_state = (parser, grammar_fingerprint(lib_path))
+
+def _export_java_file(filepath, format, cache_dir):
+    """Parse a Java file in a worker process and return its exported representation
+    
+    Trees can't be sent between processes, so the worker writes the
+    representation itself and only the text is sent back.
+    """
+    try:
+        parser, grammar_id = _worker_state
+        with open_source(filepath) as f:
+            tree, content = parse_source(parser, f)
+        
+        out = io.StringIO()
+        ast_info = AstInfo(filepath, None, tree, content, content_cache_key(grammar_id, content))
+        write_ast(ast_info, out, format, cache_dir)
+        return out.getvalue(), None
+    except Exception as e:
+        return None, str(e)
+
+def _file_size(path):
+    """Size of a file, or 0 if it can't be stat'ed"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def export_java_files(directory, output_file='combined_ast.txt', format='sexp', repo_path=None,
+                      max_workers=None, cache_dir=None, window=256, exclude_dirs=DEFAULT_EXCLUDE_DIRS):
+    """Parse the Java files in a directory on a process pool and export their ASTs
+    
+    Parsing is CPU-bound, so files are parsed by worker processes, each with
+    its own parser, and the workers also produce the exported text. The
+    grammar is set up once in this process before the workers load it. Files
+    are submitted `window` at a time, largest first so big files don't
+    finish last, and written in directory walk order like
+    export_asts_to_file.
+    """
+    try:
+        java_language, parser, lib_path = setup_tree_sitter(repo_path)
+    except Exception as e:
+        print(f"❌ Error setting up tree-sitter: {e}")
+        return
     
+    print(f"\n📁 Scanning directory: {directory}")
+    java_files = find_java_files(directory, exclude_dirs)
+    if not java_files:
+        print("No ASTs to export")
+        return
+    
+    exported_count = 0
+    # The walk yields paths under directory, so relative paths are a slice
+    prefix_length = len(os.path.join(directory, ""))
+    
+    def write_batch(f, batch):
+        nonlocal exported_count
+        for filepath, future in batch:
+            text, error = future.result()
+            if error is not None:
+                logger.warning("❌ Error parsing %s: %s", filepath, error)
+                continue
+            
+            f.writelines((
+                file_header(exported_count, filepath, filepath[prefix_length:]),
+                text,
+                FILE_FOOTER
+            ))
+            exported_count += 1
+    
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_export_worker,
+                             initargs=(os.path.abspath(lib_path),)) as executor, \
+            open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        f.write(export_header(format))
+        
+        # The next batch is submitted before the previous one is written, so
+        # the workers stay busy while results are written
+        previous = None
+        for start in range(0, len(java_files), window):
+            batch = java_files[start:start + window]
+            futures = {
+                filepath: executor.submit(_export_java_file, filepath, format, cache_dir)
+                for filepath in sorted(batch, key=_file_size, reverse=True)
+            }
+            if previous is not None:
+                write_batch(f, previous)
+            previous = [(filepath, futures[filepath]) for filepath in batch]
+        write_batch(f, previous)
+    
+    print(f"\n📊 Exported {exported_count} out of {len(java_files)} Java files")
     print(f"💾 ASTs exported to: {output_file}")
 
 def test_setup(repo_path=None):
@@ -343,7 +816,7 @@ if __name__ == "__main__":
         sys.exit(1)
     
     # Parse all Java files
-    parsed_asts = parse_java_files(java_directory, repo_path)
+    parsed_asts = parse_java_files(java_directory, repo_path, verbose=True)
     
     if parsed_asts:
         # Show summary
@@ -361,7 +834,11 @@ if __name__ == "__main__":
             if format_choice not in ['sexp', 'json']:
                 format_choice = 'sexp'
             
-            export_asts_to_file(parsed_asts, output_file, format_choice)
+            # The parsed trees are released first; the export parses the files
+            # again on a process pool
+            del parsed_asts
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(output_file)), '.ast_cache')
+            export_java_files(java_directory, output_file, format_choice, repo_path, cache_dir=cache_dir)
         
         print("\n🎉 Processing complete!")
     else:
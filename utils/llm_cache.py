@@ -0,0 +1,329 @@
+"""
+Response cache for LLM queries.
+
+Responses are stored in a small SQLite database and looked up in two tiers:
+an exact match on the hashed (namespace, fingerprint, query) key, followed by
+a semantic match that compares the query embedding against the embeddings of
+earlier queries made for the same namespace and fingerprint.
+
+A cache is opened with a scope identifying the models it caches responses
+of, e.g. the LLM and embedding model names. Entries of other scopes are
+neither returned nor compared against, so switching models never serves
+responses of the previous model.
+
+Entries can also carry a signature, the set of IDs of the context chunks the
+response was generated from. When a lookup passes a signature, an entry only
+counts as a hit if its signature overlaps enough with the lookup's, so a
+cached response is only reused for (nearly) the same context.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Collection, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from utils import fast_json
+
+
+def fingerprint_repository(
+    repo_url: str,
+    repo_path: str,
+    file_list: Iterable[str],
+    commit_sha: Optional[str] = None
+) -> str:
+    """Compute a fingerprint identifying the repository contents.
+
+    Uses the relative path of every analyzed file along with the commit,
+    which identifies the content of the files exactly. Without a commit the
+    content of every file is hashed instead.
+
+    Args:
+        repo_url: URL of the repository
+        repo_path: Path to the local clone
+        file_list: Paths of the repository files, relative to repo_path
+        commit_sha: Commit checked out in the clone, if known
+
+    Returns:
+        Hex digest of the repository fingerprint
+    """
+    digest = hashlib.sha256(repo_url.encode("utf-8"))
+    digest.update(f"\0{commit_sha or ''}\0".encode("utf-8"))
+    for file_path in sorted(file_list):
+        digest.update(f"{file_path}\0".encode("utf-8"))
+        if commit_sha is None:
+            content_digest = hashlib.sha256()
+            try:
+                with open(os.path.join(repo_path, file_path), "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        content_digest.update(block)
+            except OSError:
+                content_digest.update(b"\0unreadable")
+            digest.update(content_digest.digest())
+    return digest.hexdigest()
+
+
+class SemanticLLMCache:
+    """Exact-match and semantic cache for LLM responses."""
+
+    def __init__(
+        self,
+        path: str,
+        similarity_threshold: float = 0.95,
+        ttl: Optional[float] = None,
+        signature_threshold: float = 0.8,
+        scope: str = ""
+    ):
+        """Initialize the cache.
+
+        Args:
+            path: Path to the SQLite database file
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            ttl: Maximum age of an entry in seconds, or None to keep entries forever
+            signature_threshold: Minimum Jaccard similarity between the signature
+                of an entry and the lookup signature for a hit
+            scope: Identifies the models responses are cached for; entries
+                are only shared between caches with the same scope
+        """
+        self.path = Path(path)
+        self.scope = scope
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.signature_threshold = signature_threshold
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, namespace TEXT, fingerprint TEXT, "
+                "query TEXT, embedding BLOB, payload TEXT, created_at REAL, "
+                "signature TEXT)"
+            )
+            # Databases created before signatures were stored lack the column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "signature" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN signature TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_scope "
+                "ON responses (namespace, fingerprint)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection, committing and closing it when done.
+
+        A connection is opened per operation so the cache can be shared by
+        worker threads.
+        """
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _scoped(self, namespace: str) -> str:
+        """Namespace as stored, qualified with the cache scope."""
+        return f"{self.scope}\0{namespace}" if self.scope else namespace
+
+    def make_key(self, namespace: str, fingerprint: str, query: str) -> str:
+        """Build the exact-match key for a query."""
+        digest = hashlib.sha256()
+        for part in (self._scoped(namespace), fingerprint, query):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _min_created_at(self) -> float:
+        """Oldest creation time still considered fresh."""
+        return time.time() - self.ttl if self.ttl is not None else 0.0
+
+    def _signature_matches(
+        self,
+        stored: Optional[str],
+        signature: Optional[Collection[str]]
+    ) -> bool:
+        """Check a stored signature against a lookup signature.
+
+        Lookups without a signature match any entry.
+        """
+        if signature is None:
+            return True
+        if stored is None:
+            return False
+
+        stored_ids = set(fast_json.loads(stored))
+        lookup_ids = set(signature)
+        union = stored_ids | lookup_ids
+        if not union:
+            return True
+        return len(stored_ids & lookup_ids) / len(union) >= self.signature_threshold
+
+    def get(
+        self,
+        namespace: str,
+        fingerprint: str,
+        query: str,
+        signature: Optional[Collection[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Look up an exact match for a query.
+
+        Returns:
+            Cached payload, or None on a miss
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, signature FROM responses WHERE key = ? AND created_at >= ?",
+                (self.make_key(namespace, fingerprint, query), self._min_created_at())
+            ).fetchone()
+
+        if row is None or not self._signature_matches(row[1], signature):
+            return None
+        return fast_json.loads(row[0])
+
+    def get_similar(
+        self,
+        namespace: str,
+        fingerprint: str,
+        embedding: List[float],
+        signature: Optional[Collection[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Look up the most similar earlier query above the similarity threshold.
+
+        Returns:
+            Cached payload, or None on a miss
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT embedding, payload, signature FROM responses "
+                "WHERE namespace = ? AND fingerprint = ? AND created_at >= ? "
+                "AND embedding IS NOT NULL",
+                (self._scoped(namespace), fingerprint, self._min_created_at())
+            ).fetchall()
+
+        # Only embeddings of the query's dimension can be compared with it
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        rows = [row for row in rows if len(row[0]) == query_vector.nbytes]
+        if not rows:
+            return None
+
+        matrix = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        similarities = (matrix @ query_vector) / np.where(norms == 0, 1.0, norms)
+
+        # Most similar entries first, stopping below the threshold
+        for best in np.argsort(-similarities):
+            if similarities[best] < self.similarity_threshold:
+                break
+            if self._signature_matches(rows[best][2], signature):
+                return fast_json.loads(rows[best][1])
+
+        return None
+
+    def set(
+        self,
+        namespace: str,
+        fingerprint: str,
+        query: str,
+        payload: Dict[str, Any],
+        embedding: Optional[List[float]] = None,
+        signature: Optional[Collection[str]] = None
+    ) -> None:
+        """Store a payload for a query, pruning expired entries."""
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        signature_text = fast_json.dumps(sorted(signature)) if signature is not None else None
+
+        with self._connect() as conn:
+            if self.ttl is not None:
+                conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (self._min_created_at(),)
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, namespace, fingerprint, query, embedding, payload, created_at, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.make_key(namespace, fingerprint, query),
+                    self._scoped(namespace),
+                    fingerprint,
+                    query,
+                    blob,
+                    fast_json.dumps(payload, default=str),
+                    time.time(),
+                    signature_text
+                )
+            )
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        fingerprint: str,
+        query: str,
+        compute: Callable[[], Dict[str, Any]],
+        embed: Optional[Callable[[str], List[float]]] = None,
+        signature: Optional[Collection[str]] = None
+    ) -> Dict[str, Any]:
+        """Return a cached payload for the query, computing and storing it on a miss.
+
+        Args:
+            namespace: Logical owner of the entry (e.g. the agent name)
+            fingerprint: Identifies the data the query was answered against
+            query: Query text
+            compute: Callable producing the payload on a cache miss
+            embed: Optional callable embedding the query for semantic lookups
+            signature: Optional IDs of the context chunks the query is
+                answered from
+
+        Returns:
+            Cached or freshly computed payload
+        """
+        payload = self.get(namespace, fingerprint, query, signature)
+        if payload is not None:
+            return payload
+
+        embedding = embed(query) if embed is not None else None
+        if embedding is not None:
+            payload = self.get_similar(namespace, fingerprint, embedding, signature)
+            if payload is not None:
+                return payload
+
+        payload = compute()
+        self.set(namespace, fingerprint, query, payload, embedding, signature)
+        return payload
+
+    async def aget_or_compute(
+        self,
+        namespace: str,
+        fingerprint: str,
+        query: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        embed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+        signature: Optional[Collection[str]] = None
+    ) -> Dict[str, Any]:
+        """Async version of get_or_compute taking coroutine functions.
+
+        SQLite lookups and writes can block, e.g. waiting for another
+        writer's lock, so they run on worker threads rather than on the
+        event loop other agents share.
+        """
+        payload = await asyncio.to_thread(self.get, namespace, fingerprint, query, signature)
+        if payload is not None:
+            return payload
+
+        embedding = await embed(query) if embed is not None else None
+        if embedding is not None:
+            payload = await asyncio.to_thread(
+                self.get_similar, namespace, fingerprint, embedding, signature
+            )
+            if payload is not None:
+                return payload
+
+        payload = await compute()
+        await asyncio.to_thread(self.set, namespace, fingerprint, query, payload, embedding, signature)
+        return payload
@@ -0,0 +1,50 @@
+"""
+Shared model clients for the CodeInsight agents.
+
+LlamaIndex resolves models when they are assigned to Settings: a LangChain
+LLM is wrapped in an adapter and an embedding model is validated (and, for
+local models, loaded). The models are therefore assigned to Settings once
+and shared by every agent. Agents read Settings.llm and Settings.embed_model
+and should not assign them themselves; use configure_settings instead.
+"""
+
+import threading
+from typing import Any, Optional, Tuple
+
+from llama_index.core.settings import Settings
+
+from utils.config import AgentConfig
+
+# Models last assigned to Settings, as (llm, embed_model)
+_configured: Optional[Tuple[Any, Any]] = None
+_lock = threading.Lock()
+
+
+def configure_settings(config: AgentConfig) -> None:
+    """Assign the configured models to the global LlamaIndex Settings.
+
+    Does nothing if the same models are already assigned, so it is cheap
+    to call wherever Settings are about to be used.
+
+    Args:
+        config: Configuration with the LLM and embedding model to use
+    """
+    global _configured
+
+    with _lock:
+        if (
+            _configured is not None
+            and _configured[0] is config.llm
+            and _configured[1] is config.embed_model
+        ):
+            return
+
+        if config.llm is not None:
+            Settings.llm = config.llm
+        if config.embed_model is not None:
+            Settings.embed_model = config.embed_model
+
+        # Embed chunks in batches rather than a request per chunk
+        Settings.embed_model.embed_batch_size = config.effective_embed_batch_size
+
+        _configured = (config.llm, config.embed_model)